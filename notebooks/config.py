@@ -88,9 +88,15 @@ output_road_network = f'{out_folder}road_network.gpkg'
 # Final network
 output_final_network = f'{out_folder}final_network.gpkg'
 
+# Landmark distances for fast route planning on the final network
+output_final_network_landmarks = f'{out_folder}final_network_landmarks.npz'
+
 # Ahn folder
 ahn_folder = f'{in_folder}ahn/'
 
+# Cache for BGT data from the WFS
+bgt_cache_folder = f'{out_folder}bgt_cache/'
+
 # BGT folder
 bgt_folder = f'{in_folder}bgt/'
 
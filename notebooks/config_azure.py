@@ -88,6 +88,9 @@ output_road_network = f'{out_folder}road_network.gpkg'
 # Final network
 output_final_network = f'{out_folder}final_network.gpkg'
 
+# Landmark distances for fast route planning on the final network
+output_final_network_landmarks = f'{out_folder}final_network_landmarks.npz'
+
 
 # Folders in ovl container
 
@@ -97,6 +100,9 @@ base_folder_ovl = '/home/azureuser/cloudfiles/code/blobfuse/ovl/'
 # Ahn folder
 ahn_folder = f'{base_folder_ovl}ahn/Amsterdam/ahn4_npz/'
 
+# Cache for BGT data from the WFS
+bgt_cache_folder = f'{out_folder}bgt_cache/'
+
 # BGT folder
 bgt_folder = f'{base_folder_ovl}bgt/bgt_roads/'
 
@@ -35,6 +35,19 @@ bgt_road_layers = ['rijbaan lokale weg', 'rijbaan regionale weg',
 bbox = ((114567.240, 484813.834), (114837.559, 485139.165)) # Demo area
 # bbox = None  # Get all data, entire Amsterdam
 
+# Bounding box of Amsterdam, scraped in tiles (of tile size in meters) when bbox is None
+bbox_amsterdam = ((110000, 476000), (136000, 494000))
+bgt_tile_size = 1000
+
+# Number of features per BGT WFS request
+bgt_page_size = 10000
+
+# Cache for BGT data from the WFS: maximum age (in seconds, None to never expire) and maximum
+# total size (in bytes). In offline mode only cached data is used.
+bgt_cache_max_age = 7 * 24 * 3600
+bgt_cache_max_size = 2 * 1024**3
+bgt_offline = False
+
 # Resolution (in m) for min and avg width computation
 width_resolution = 1
 
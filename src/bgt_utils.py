@@ -1,73 +1,410 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import requests
 import sys
 sys.path.append('../notebooks')
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Polygon
+import shapely
+import shapely.geometry as sg
 
 import settings as st
 
+if st.my_run == "azure":
+    import config_azure as cf
+elif st.my_run == "local":
+    import config as cf
+
 # Base URL for the Web Feature Service
 WFS_URL = 'https://api.data.amsterdam.nl/v1/wfs/bgt/?'
 
-def scrape_amsterdam_bgt(bbox=None):
+def get_cache_path(params, cache_folder):
     """
-    Scrape BGT layer information from the Amsterdam WFS.
+    Get the cache file for a WFS request, named by a hash of the request.
+    Parameters:
+    - params (dict): Request parameters.
+    - cache_folder (str): Folder with the cached responses.
+    Returns:
+    Path to the cache file.
+    """
+    request = json.dumps([WFS_URL, params], sort_keys=True)
+    return os.path.join(cache_folder, hashlib.sha256(request.encode()).hexdigest() + '.json')
+
+def read_cache(cache_path, max_age=None):
+    """
+    Read a cached WFS response if it exists and is not expired.
+    Parameters:
+    - cache_path (str): Path to the cache file.
+    - max_age (float): Maximum age of the cache file in seconds, None to never expire.
+    Returns:
+    JSON content or None if there is no valid cache file.
+    """
+    if not os.path.exists(cache_path):
+        return None
+    if max_age is not None and time.time() - os.path.getmtime(cache_path) > max_age:
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            content = json.load(f)
+        # Mark as recently used, for eviction.
+        os.utime(cache_path, (time.time(), os.path.getmtime(cache_path)))
+    except (OSError, ValueError):
+        # Corrupt, or evicted by another thread in the meantime.
+        return None
+    return content
+
+def write_cache(cache_path, content, max_size=None):
+    """
+    Write a WFS response to the cache and evict the least recently used files above max_size.
+    Parameters:
+    - cache_path (str): Path to the cache file.
+    - content (bytes): Raw response content.
+    - max_size (int): Maximum total size of the cache folder in bytes, None for no limit.
+    """
+    cache_folder = os.path.dirname(cache_path)
+    os.makedirs(cache_folder, exist_ok=True)
+    # A temporary file per writer, so concurrent writes of the same request do not mix.
+    with tempfile.NamedTemporaryFile(dir=cache_folder, suffix='.tmp', delete=False) as f:
+        f.write(content)
+    os.replace(f.name, cache_path)
+
+    if max_size is not None:
+        evict_cache(cache_folder, max_size, keep=cache_path)
+
+def get_cache_files(cache_folder):
+    """
+    Get the cache files in a folder with their status, most recently used first.
+    Files that are removed by another thread while listing the folder are skipped.
+    Parameters:
+    - cache_folder (str): Folder with the cached responses.
+    Returns:
+    List of (os.stat_result, path) tuples.
+    """
+    files = []
+    for name in os.listdir(cache_folder):
+        path = os.path.join(cache_folder, name)
+        try:
+            if name.endswith('.json'):
+                files.append((os.stat(path), path))
+        except FileNotFoundError:
+            continue
+    return sorted(files, key=lambda file: file[0].st_atime, reverse=True)
+
+def evict_cache(cache_folder, max_size, keep=None):
+    """
+    Remove the least recently used cache files until the cache is at most max_size.
+    Parameters:
+    - cache_folder (str): Folder with the cached responses.
+    - max_size (int): Maximum total size of the cache folder in bytes.
+    - keep (str): Optional path to a cache file that is never removed.
+    """
+    total_size = 0
+    for stat, path in get_cache_files(cache_folder):
+        total_size += stat.st_size
+        if total_size > max_size and path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def get_wfs_params(bbox=None, typename='wegdelen-geometrie', count=None, start_index=None):
+    """
+    Build the parameters of a WFS GetFeature request.
     Parameters:
     - bbox (tuple): Optional bounding box ((minx, miny), (maxx, maxy)).
+    - typename (str): WFS type name.
+    - count (int): Optional maximum number of features to return.
+    - start_index (int): Optional index of the first feature to return, for paging.
     Returns:
-    JSON response or None if the request fails.
+    Dictionary with the request parameters.
     """
-    # Build the request parameters
     params = {
         'SERVICE': 'WFS',
         'VERSION': '2.0.0',
         'REQUEST': 'GetFeature',
-        'TYPENAMES': 'wegdelen-geometrie',
+        'TYPENAMES': typename,
         'OUTPUTFORMAT': 'geojson'
     }
-    
+
     if bbox:
         bbox_string = ','.join(map(str, [bbox[0][0], bbox[0][1], bbox[1][0], bbox[1][1]]))
         params['BBOX'] = bbox_string
-    
+    if count is not None:
+        params['COUNT'] = count
+    if start_index is not None:
+        params['STARTINDEX'] = start_index
+    return params
+
+def request_wfs(params, session=None, cache_folder=cf.bgt_cache_folder,
+                max_age=st.bgt_cache_max_age, max_size=st.bgt_cache_max_size,
+                offline=st.bgt_offline):
+    """
+    Send a WFS request, or read its response from the cache.
+    Parameters:
+    - params (dict): Request parameters.
+    - session (requests.Session): Optional session to reuse connections.
+    - cache_folder (str): Folder for cached responses, None to not use the cache.
+    - max_age (float): Maximum age of cached responses in seconds, None to never expire.
+    - max_size (int): Maximum total size of the cache in bytes, None for no limit.
+    - offline (bool): Only use cached responses, regardless of their age.
+    Returns:
+    JSON response or None if the response is not JSON.
+    Raises requests.HTTPError if the WFS answers with an error status.
+    """
+    if cache_folder is not None:
+        cache_path = get_cache_path(params, cache_folder)
+        content = read_cache(cache_path, None if offline else max_age)
+        if content is not None:
+            return content
+    if offline:
+        raise ValueError(f'No cached BGT data for request {params} in offline mode')
+
     # Send the GET request
-    response = requests.get(WFS_URL, params=params)
+    response = (session or requests).get(WFS_URL, params=params)
+    response.raise_for_status()
     try:
-        return response.json()
+        content = response.json()
     except ValueError:
         return None
+    if cache_folder is not None:
+        write_cache(cache_path, response.content, max_size)
+    return content
 
-def get_bgt_data_for_bbox(bbox, layers):
+def scrape_amsterdam_bgt(bbox=None, typename='wegdelen-geometrie', **cache_kwargs):
     """
-    Scrape BGT data within a specified bounding box for given layers.
+    Scrape BGT layer information from the Amsterdam WFS.
+    Responses are cached on disk per request, so all layers are fetched once and repeated
+    runs do not use the network.
     Parameters:
-    - bbox (tuple): Bounding box coordinates ((minx, miny), (maxx, maxy)).
-    - layers (list): List of BGT layers to scrape.
+    - bbox (tuple): Optional bounding box ((minx, miny), (maxx, maxy)).
+    - typename (str): WFS type name.
+    - cache_kwargs: Cache options passed to request_wfs.
     Returns:
-    GeoDataFrame with the BGT data for the specified layers.
+    JSON response or None if the request fails.
     """
-    # Retrieve data from WFS
-    json_content = scrape_amsterdam_bgt(bbox=bbox)
+    return request_wfs(get_wfs_params(bbox, typename), **cache_kwargs)
 
-    # Filter items and extract required data
-    features = [
-        (item['properties']['bgt_functie'], Polygon(item['geometry']['coordinates'][0]))
-        for item in json_content.get('features', [])
-        if item['properties']['bgt_functie'] in layers
-    ]
+def get_polygon_rings(geometries):
+    """
+    Gather the rings of GeoJSON Polygon and MultiPolygon geometries.
+    Parameters:
+    - geometries (list): GeoJSON geometry dictionaries.
+    Returns:
+    Tuple of lists (coords, ring_sizes, ring_polygon, polygon_feature, is_multi) with the
+    coordinates of all rings, the number of coordinates of each ring, the polygon of each ring,
+    the geometry of each polygon and whether each geometry is a MultiPolygon.
+    """
+    coords, ring_sizes, ring_polygon, polygon_feature, is_multi = [], [], [], [], []
+    for i, geometry in enumerate(geometries):
+        multi = geometry['type'] == 'MultiPolygon'
+        for polygon in (geometry['coordinates'] if multi else [geometry['coordinates']]):
+            for ring in polygon:
+                coords.extend(ring)
+                ring_sizes.append(len(ring))
+                ring_polygon.append(len(polygon_feature))
+            polygon_feature.append(i)
+        is_multi.append(multi)
+    return coords, ring_sizes, ring_polygon, polygon_feature, is_multi
 
-    # Unpack features if non-empty
-    if features:
-        bgt_functies, geometries = zip(*features)
-    else:
-        bgt_functies, geometries = [], []
+def geojson_to_polygons(geometries):
+    """
+    Convert GeoJSON Polygon and MultiPolygon geometries to shapely geometries in bulk.
+    The coordinates of all rings are gathered in one array and the geometries are built with
+    the vectorised shapely 2 constructors, so holes and all parts of MultiPolygons are kept.
+    All coordinates are expected to have the same dimension, Z coordinates are dropped.
+    With shapely 1.8 the geometries are built one by one with shapely.geometry.shape instead.
+    Parameters:
+    - geometries (list): GeoJSON geometry dictionaries.
+    Returns:
+    NumPy array of Polygons and MultiPolygons.
+    """
+    result = np.empty(len(geometries), dtype=object)
+    if not hasattr(shapely, 'polygons'):
+        for i, geometry in enumerate(geometries):
+            result[i] = sg.shape(geometry)
+        return result
+    if not geometries:
+        return result
+
+    coords, ring_sizes, ring_polygon, polygon_feature, is_multi = get_polygon_rings(geometries)
+    flat_coords = np.fromiter(chain.from_iterable(coords), dtype=float)
+    coords = flat_coords.reshape(len(coords), -1)[:, :2]
+    rings = shapely.linearrings(coords, indices=np.repeat(np.arange(len(ring_sizes)), ring_sizes))
+
+    # Polygons without holes are built directly from their shell.
+    ring_polygon = np.array(ring_polygon)
+    n_rings = np.bincount(ring_polygon)
+    shell = np.r_[True, ring_polygon[1:] != ring_polygon[:-1]]
+    polygons = shapely.polygons(rings[shell])
+    with_holes = np.flatnonzero(n_rings > 1)
+    if len(with_holes):
+        ring_with_holes = np.isin(ring_polygon, with_holes)
+        polygons[with_holes] = shapely.polygons(
+            rings[ring_with_holes], indices=np.searchsorted(with_holes,
+                                                            ring_polygon[ring_with_holes]))
+    polygon_feature = np.array(polygon_feature)
+    is_multi = np.array(is_multi, dtype=bool)
+
+    single = ~is_multi[polygon_feature]
+    result[polygon_feature[single]] = polygons[single]
+    if is_multi.any():
+        multi_features, multi_index = np.unique(polygon_feature[~single], return_inverse=True)
+        result[multi_features] = shapely.multipolygons(polygons[~single], indices=multi_index)
+    return result
+
+def get_feature_id(feature):
+    """
+    Get the identifier of a BGT feature, to recognise the same feature in several responses.
+    Parameters:
+    - feature (dict): GeoJSON feature.
+    Returns:
+    The BGT identificatie of the feature, its GeoJSON id, or None if it has neither.
+    """
+    properties = feature.get('properties') or {}
+    for key in ('identificatie_lokaal_id', 'identificatie'):
+        if properties.get(key) is not None:
+            return properties[key]
+    return feature.get('id')
 
-    # Create a GeoDataFrame
+def features_to_gdf(features, layers, id_column=None):
+    """
+    Convert GeoJSON features of the given BGT layers to a GeoDataFrame.
+    Parameters:
+    - features (list): GeoJSON features.
+    - layers (list): List of BGT layers to keep.
+    - id_column (str): Optional column to store the feature identifiers in.
+    Returns:
+    GeoDataFrame with the BGT data for the specified layers.
+    """
+    # Filter items on layer with one mask, before building any geometry
+    bgt_functies = np.array([item['properties']['bgt_functie'] for item in features], dtype=object)
+    mask = np.isin(bgt_functies, layers)
+    features = [item for item, keep in zip(features, mask) if keep]
+
+    # Create a GeoDataFrame, keeping holes and MultiPolygons
+    geometries = geojson_to_polygons([item['geometry'] for item in features])
     gdf = gpd.GeoDataFrame({
-        'naam': bgt_functies,
+        'naam': bgt_functies[mask],
         'geometry': geometries
     }, geometry='geometry', crs=st.CRS)
+    if id_column is not None:
+        gdf[id_column] = pd.Series([get_feature_id(item) for item in features], dtype=object)
+
+    return gdf
+
+def get_bbox_tiles(bbox, tile_size):
+    """
+    Split a bounding box into a grid of tiles.
+    Parameters:
+    - bbox (tuple): Bounding box ((minx, miny), (maxx, maxy)).
+    - tile_size (float): Size of the tiles in meters.
+    Returns:
+    List of tile bounding boxes ((minx, miny), (maxx, maxy)).
+    """
+    ((x_min, y_min), (x_max, y_max)) = bbox
+    xs = list(np.arange(x_min, x_max, tile_size)) + [x_max]
+    ys = list(np.arange(y_min, y_max, tile_size)) + [y_max]
+    return [((float(x0), float(y0)), (float(x1), float(y1)))
+            for x0, x1 in zip(xs[:-1], xs[1:]) for y0, y1 in zip(ys[:-1], ys[1:])]
+
+def has_next_page(json_content, start_index, page_size):
+    """
+    Check whether a paged WFS response is followed by more features.
+    The 'next' link or numberMatched of the response are used if the WFS returns them, as the
+    WFS can return fewer features per page than requested.
+    Parameters:
+    - json_content (dict): JSON response of one page.
+    - start_index (int): Index of the first feature of the page.
+    - page_size (int): Number of features requested per page.
+    Returns:
+    True if there are more features after this page.
+    """
+    n_features = len(json_content.get('features', []))
+    if n_features == 0:
+        return False
+    if 'links' in json_content:
+        return any(link.get('rel') == 'next' for link in json_content['links'])
+    number_matched = json_content.get('numberMatched')
+    if isinstance(number_matched, int):
+        return start_index + n_features < number_matched
+    return n_features >= page_size
+
+def get_bgt_data_for_tile(bbox, layers, session=None, typename='wegdelen-geometrie',
+                          page_size=st.bgt_page_size, **cache_kwargs):
+    """
+    Scrape BGT data within a tile page by page, only keeping the given layers of each page.
+    Parameters:
+    - bbox (tuple): Bounding box ((minx, miny), (maxx, maxy)) of the tile.
+    - layers (list): List of BGT layers to scrape.
+    - session (requests.Session): Optional session to reuse connections.
+    - typename (str): WFS type name.
+    - page_size (int): Number of features per request.
+    - cache_kwargs: Cache options passed to request_wfs.
+    Returns:
+    GeoDataFrame with the BGT data for the specified layers and the feature identifiers in
+    the 'id' column.
+    """
+    pages = []
+    start_index = 0
+    while True:
+        params = get_wfs_params(bbox, typename, count=page_size, start_index=start_index)
+        json_content = request_wfs(params, session=session, **cache_kwargs)
+        if json_content is None:
+            raise ValueError(f'Failed to retrieve BGT data for tile {bbox}')
+        features = json_content.get('features', [])
+        pages.append(features_to_gdf(features, layers, id_column='id'))
+        if not has_next_page(json_content, start_index, page_size):
+            break
+        start_index += len(features)
+    return pd.concat(pages, ignore_index=True)
+
+def get_bgt_data_tiled(bbox, layers, tile_size=st.bgt_tile_size, n_workers=8, **kwargs):
+    """
+    Scrape BGT data within a large bounding box for given layers, in concurrent tiles.
+    Features on the border of tiles are returned once, based on their BGT identificatie.
+    Parameters:
+    - bbox (tuple): Bounding box coordinates ((minx, miny), (maxx, maxy)).
+    - layers (list): List of BGT layers to scrape.
+    - tile_size (float): Size of the tiles in meters.
+    - n_workers (int): Number of concurrent requests.
+    - kwargs: Paging and cache options passed to get_bgt_data_for_tile.
+    Returns:
+    GeoDataFrame with the BGT data for the specified layers.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=n_workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    with session, ThreadPoolExecutor(n_workers) as executor:
+        tiles = list(executor.map(
+            lambda tile: get_bgt_data_for_tile(tile, layers, session=session, **kwargs),
+            get_bbox_tiles(bbox, tile_size)))
 
-    return gdf
\ No newline at end of file
+    gdf = gpd.GeoDataFrame(pd.concat(tiles, ignore_index=True), geometry='geometry', crs=st.CRS)
+    duplicated = gdf['id'].duplicated() & gdf['id'].notna()
+    return gdf[~duplicated].drop(columns='id').reset_index(drop=True)
+
+def get_bgt_data_for_bbox(bbox, layers):
+    """
+    Scrape BGT data within a specified bounding box for given layers.
+    Without a bounding box, all of Amsterdam is scraped in tiles.
+    Parameters:
+    - bbox (tuple): Bounding box coordinates ((minx, miny), (maxx, maxy)).
+    - layers (list): List of BGT layers to scrape.
+    Returns:
+    GeoDataFrame with the BGT data for the specified layers.
+    """
+    if bbox is None:
+        return get_bgt_data_tiled(st.bbox_amsterdam, layers)
+
+    # Retrieve data from WFS
+    json_content = scrape_amsterdam_bgt(bbox=bbox)
+    return features_to_gdf(json_content.get('features', []), layers)
\ No newline at end of file
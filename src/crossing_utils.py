@@ -1,7 +1,12 @@
 import numpy as np
+import pandas as pd
+import shapely
 import shapely.geometry as sg
 import geopandas as gpd
 import networkx as nx
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
 from tqdm.notebook import tqdm
 tqdm.pandas()
@@ -46,8 +51,106 @@ def get_nodes_to_connect(dist_sort, dist_argsort, min_dist=0, max_dist=10):
     return nodes_to_connect
 
 
+def get_nearby_pairs(source_nodes, target_nodes, min_dist=0, max_dist=10):
+    """
+    Get all pairs of source and target nodes within a distance range using KD-trees.
+
+    As in get_distance_matrices, a source node is never paired with the target node
+    with the same index.
+
+    Parameters:
+    - source_nodes (GeoDataFrame): GeoDataFrame of source nodes.
+    - target_nodes (GeoDataFrame): GeoDataFrame of target nodes.
+    - min_dist (float): Minimum distance threshold.
+    - max_dist (float): Maximum distance threshold.
+
+    Returns:
+    Tuple of NumPy arrays (source, target) with the node indices of the pairs, sorted by
+    source node and by distance.
+    """
+    source_x_y = source_nodes[['x', 'y']].values
+    target_x_y = target_nodes[['x', 'y']].values
+    if len(source_x_y) == 0 or len(target_x_y) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    source_tree, target_tree = cKDTree(source_x_y), cKDTree(target_x_y)
+    pairs = source_tree.sparse_distance_matrix(target_tree, max_dist, output_type='ndarray')
+    source, target, dist = pairs['i'], pairs['j'], pairs['v']
+    keep = (dist > min_dist) & (dist < max_dist) & (source != target)
+    source, target, dist = source[keep], target[keep], dist[keep]
+
+    order = np.lexsort((target, dist, source))
+    return source[order].astype(int), target[order].astype(int)
+
+
+def get_nearby_nodes(source_nodes, target_nodes, min_dist=0, max_dist=10):
+    """
+    Get the target nodes within a distance range of each source node using KD-trees.
+
+    Gives the same result as get_nodes_to_connect on the output of get_distance_matrices,
+    without computing the full distance matrix.
+
+    Parameters:
+    - source_nodes (GeoDataFrame): GeoDataFrame of source nodes.
+    - target_nodes (GeoDataFrame): GeoDataFrame of target nodes.
+    - min_dist (float): Minimum distance threshold.
+    - max_dist (float): Maximum distance threshold.
+
+    Returns:
+    List of lists containing indices of nodes to connect for each source node,
+    sorted by distance.
+    """
+    source, target = get_nearby_pairs(source_nodes, target_nodes, min_dist, max_dist)
+    splits = np.searchsorted(source, np.arange(1, len(source_nodes)))
+    return [row.tolist() for row in np.split(target, splits)] if len(source_nodes) else []
+
+
+def get_pair_rank(source):
+    """
+    Get the rank of each pair among the pairs of the same source node.
+
+    Parameters:
+    - source (numpy.ndarray): Sorted source node index of each pair.
+
+    Returns:
+    NumPy array with the rank of each pair, starting at 0.
+    """
+    first = np.searchsorted(source, source, side='left')
+    return np.arange(len(source)) - first
+
+
+def get_point_coords(gdf, column='geometry'):
+    """
+    Get the coordinates of a column of points.
+
+    Parameters:
+    - gdf (GeoDataFrame): GeoDataFrame with points.
+    - column (str): Column name containing the points.
+
+    Returns:
+    NumPy array of shape (n, 2) with the coordinates.
+    """
+    points = gpd.GeoSeries(gdf[column].values)
+    return np.column_stack([points.x.values, points.y.values])
+
+
+def create_lines(start_coords, end_coords):
+    """
+    Create straight LineStrings between pairs of coordinates.
+
+    Parameters:
+    - start_coords (numpy.ndarray): Start coordinates of shape (n, 2).
+    - end_coords (numpy.ndarray): End coordinates of shape (n, 2).
+
+    Returns:
+    List of LineStrings.
+    """
+    if hasattr(shapely, 'linestrings'):
+        return list(shapely.linestrings(np.stack([start_coords, end_coords], axis=1)))
+    return [sg.LineString([start, end]) for start, end in zip(start_coords, end_coords)]
+
+
 def create_edges_geometries(gdf_source_nodes, gdf_target_nodes, nodes_to_connect,
-                            dist_sort, max_connections):
+                            max_connections):
     """
     Create edges and corresponding geometries.
 
@@ -56,22 +159,21 @@ def create_edges_geometries(gdf_source_nodes, gdf_target_nodes, nodes_to_connect
     - gdf_target_nodes (GeoDataFrame): GeoDataFrame of target nodes.
     - nodes_to_connect (list): List of lists containing indices of nodes to
       connect for each source node.
-    - dist_sort (numpy.ndarray): Sorted distance matrix.
     - max_connections (int): Maximum number of connections per source node.
 
     Returns:
     Tuple of lists (edges, edges_geometries) representing edge indices and
     corresponding geometries.
     """
-    edges, edges_geometries = [], []
-    for i in range(len(dist_sort)):
-        for j in range(len(nodes_to_connect[i])):
-            if j < max_connections:
-                edges.append([i, nodes_to_connect[i][j]])
-    for edge in edges:
-        source_node = gdf_source_nodes.iloc[edge[0]]['geometry']
-        target_node = gdf_target_nodes.iloc[edge[1]]['geometry']
-        edges_geometries.append(sg.LineString([source_node, target_node]))
+    source = np.repeat(np.arange(len(nodes_to_connect)),
+                       [len(targets) for targets in nodes_to_connect]).astype(int)
+    target = np.array([t for targets in nodes_to_connect for t in targets], dtype=int)
+    keep = get_pair_rank(source) < max_connections
+    source, target = source[keep], target[keep]
+
+    edges = np.column_stack([source, target]).tolist()
+    edges_geometries = create_lines(get_point_coords(gdf_source_nodes)[source],
+                                    get_point_coords(gdf_target_nodes)[target])
     return edges, edges_geometries
 
 
@@ -93,30 +195,20 @@ def get_connections(gdf_source_nodes, gdf_target_nodes, max_dist=20, max_connect
     Returns:
     GeoDataFrame or Tuple of lists representing connections between nodes.
     """
-    dist_sort, dist_argsort = get_distance_matrices(gdf_source_nodes, gdf_target_nodes)
-    nodes_to_connect = get_nodes_to_connect(dist_sort, dist_argsort, max_dist=max_dist)
+    source, target = get_nearby_pairs(gdf_source_nodes, gdf_target_nodes, max_dist=max_dist)
 
     if include_cc_rule:
-        edges, edges_geometries = [], []
-        for source_node in tqdm(range(len(dist_sort))):
-            restricted_cc, connections_count = [], 0
-
-            # Only connect multiple target nodes to source node if
-            # target nodes have different connected component.
-            for target_node in nodes_to_connect[source_node]:
-                target_cc = gdf_target_nodes.iloc[target_node][cc_column]
-                if target_cc not in restricted_cc and connections_count < max_connections:
-                    edges.append([source_node, target_node])
-                    source_node_geom = gdf_source_nodes.iloc[source_node]['geometry']
-                    target_node_geom = gdf_target_nodes.iloc[target_node]['geometry']
-                    edge = sg.LineString([source_node_geom, target_node_geom])
-                    edges_geometries.append(edge)
-                    restricted_cc.append(target_cc)
-                    connections_count += 1
-    else:
-        edges, edges_geometries = create_edges_geometries(gdf_source_nodes, gdf_target_nodes,
-                                                          nodes_to_connect, dist_sort,
-                                                          max_connections=max_connections)
+        # Only connect multiple target nodes to source node if
+        # target nodes have different connected component.
+        target_cc = gdf_target_nodes[cc_column].values[target]
+        first_of_cc = ~pd.DataFrame({'source': source, 'cc': target_cc}).duplicated().values
+        source, target = source[first_of_cc], target[first_of_cc]
+
+    keep = get_pair_rank(source) < max_connections
+    source, target = source[keep], target[keep]
+    edges = np.column_stack([source, target]).tolist()
+    edges_geometries = create_lines(get_point_coords(gdf_source_nodes)[source],
+                                    get_point_coords(gdf_target_nodes)[target])
 
     if return_gdf:
         gdf_edges = gpd.GeoDataFrame(geometry=edges_geometries, crs=crs)
@@ -143,53 +235,109 @@ def get_crossing_edges_from_curb_heights(gdf_source_nodes, gdf_target_nodes,
     Returns:
     GeoDataFrame representing crossing edges.
     """
-    dist_sort, dist_argsort = get_distance_matrices(gdf_source_nodes, gdf_target_nodes)
-    nodes_to_connect = get_nodes_to_connect(dist_sort, dist_argsort,
-                                            min_dist=min_dist, max_dist=max_dist)
-
-    edges_geometries, edges_dict = [], {}
-    for source_node in tqdm(range(len(dist_sort))):
-        source_cc = gdf_source_nodes.loc[source_node, cc_column]
-        restricted_cc, connections_count = [source_cc], 0
-
-        if source_cc not in edges_dict.keys():
-            edges_dict[source_cc] = {}
-
-        for target_node in nodes_to_connect[source_node]:
-            target_cc = gdf_target_nodes.loc[target_node, cc_column]
-
+    source, target = get_nearby_pairs(gdf_source_nodes, gdf_target_nodes,
+                                      min_dist=min_dist, max_dist=max_dist)
+    source_cc = gdf_source_nodes[cc_column].values
+    target_cc = gdf_target_nodes[cc_column].values[target]
+    source_coords = get_point_coords(gdf_source_nodes, 'centroid')
+    target_coords = get_point_coords(gdf_target_nodes, 'centroid')
+    delta = target_coords[target] - source_coords[source]
+    pair_length = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+
+    # Only keep shortest possible edge between source cc and target node. The rule depends on
+    # the edges kept so far, so the pairs are visited in order on plain arrays.
+    edges_dict = {cc: {} for cc in source_cc.tolist()}
+    pair_bounds = np.searchsorted(source, np.arange(len(source_cc) + 1)).tolist()
+    target, target_cc, pair_length = target.tolist(), target_cc.tolist(), pair_length.tolist()
+    for source_node in tqdm(range(len(source_cc))):
+        edges = edges_dict[source_cc[source_node]]
+        restricted_cc, connections_count = [source_cc[source_node]], 0
+
+        for pair in range(pair_bounds[source_node], pair_bounds[source_node + 1]):
             # Only connect multiple target nodes to source node if
             # target nodes have different connected component.
-            if target_cc not in restricted_cc and connections_count < max_connections:
-                source_node_geom = gdf_source_nodes.iloc[source_node]['centroid']
-                target_node_geom = gdf_target_nodes.iloc[target_node]['centroid']
-                pos_edge = sg.LineString([source_node_geom, target_node_geom])
-                pos_length = pos_edge.length
-
-                # Only keep shortest possible edge between source node and target cc.
-                if target_node in edges_dict[source_cc].keys():
-                    if edges_dict[source_cc][target_node]['length'] > pos_length:
-                        edges_dict[source_cc][target_node]['edge'] = pos_edge
-                        edges_dict[source_cc][target_node]['length'] = pos_length
-                        connections_count += 1
-                        restricted_cc.append(target_cc)
-                else:
-                    edges_dict[source_cc][target_node] = {}
-                    edges_dict[source_cc][target_node]['edge'] = pos_edge
-                    edges_dict[source_cc][target_node]['length'] = pos_length
-
-                    connections_count += 1
-                    restricted_cc.append(target_cc)
+            if target_cc[pair] in restricted_cc or connections_count >= max_connections:
+                continue
+            target_node = target[pair]
+            if target_node in edges and edges[target_node][1] <= pair_length[pair]:
+                continue
+            edges[target_node] = (source_node, pair_length[pair])
+            connections_count += 1
+            restricted_cc.append(target_cc[pair])
 
     # Create edge geometries.
-    for source_cc in edges_dict.keys():
-        for target_node in edges_dict[source_cc].keys():
-            edges_geometries.append(edges_dict[source_cc][target_node].get('edge'))
+    edge_nodes = np.array([(source_node, target_node) for edges in edges_dict.values()
+                           for target_node, (source_node, _) in edges.items()],
+                          dtype=int).reshape(-1, 2)
+    edges_geometries = create_lines(source_coords[edge_nodes[:, 0]],
+                                    target_coords[edge_nodes[:, 1]])
 
     gdf_edges = gpd.GeoDataFrame(geometry=edges_geometries, crs=crs)
     return gdf_edges
 
 
+def get_network_nodes(lines):
+    """
+    Get the nodes of a network of lines, the nodes are the end points of the lines.
+
+    Parameters:
+    - lines (GeoSeries or list): LineStrings of the network.
+
+    Returns:
+    Tuple of NumPy arrays (node_coords, edge_nodes) with the coordinates of the nodes, in order
+    of first appearance, and the start and end node of each line.
+    """
+    end_points = np.array([line.coords[i][:2] for line in lines for i in (0, -1)],
+                          dtype=float).reshape(-1, 2)
+    unique_coords, first_index, node = np.unique(end_points, axis=0, return_index=True,
+                                                 return_inverse=True)
+    order = np.argsort(first_index)
+    rank = np.empty(len(order), dtype=int)
+    rank[order] = np.arange(len(order))
+    return unique_coords[order], rank[node.reshape(-1)].reshape(-1, 2)
+
+
+def get_connected_components(lines):
+    """
+    Label the connected components of a network of lines.
+
+    Replaces looking up each node in the list of nx.connected_components, the component ids
+    can be shared between the nodes and edges of the network.
+
+    Parameters:
+    - lines (GeoSeries or list): LineStrings of the network.
+
+    Returns:
+    Tuple of NumPy arrays (edge_cc, node_coords, node_cc) with the component id of each line,
+    the coordinates of the nodes and the component id of each node.
+    """
+    node_coords, edge_nodes = get_network_nodes(lines)
+    n_nodes = len(node_coords)
+    graph = coo_matrix((np.ones(len(edge_nodes)), (edge_nodes[:, 0], edge_nodes[:, 1])),
+                       shape=(n_nodes, n_nodes))
+    _, node_cc = connected_components(graph, directed=False)
+    return node_cc[edge_nodes[:, 0]], node_coords, node_cc
+
+
+def get_points_cc(points, node_coords, node_cc):
+    """
+    Get the connected component id of points that are nodes of a network.
+
+    Parameters:
+    - points (numpy.ndarray): Coordinates of the points of shape (n, 2).
+    - node_coords (numpy.ndarray): Coordinates of the network nodes.
+    - node_cc (numpy.ndarray): Component id of each network node.
+
+    Returns:
+    NumPy array with the component id of each point, -1 for points that are not a node.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(node_coords) == 0:
+        return np.full(len(points), -1)
+    dist, node = cKDTree(node_coords).query(points)
+    return np.where(dist == 0, node_cc[np.minimum(node, len(node_cc) - 1)], -1)
+
+
 def connect_curb_crossing_edge(gdf_source_nodes, gdf_target_nodes, walking_graph, max_dist=20,
                                max_connections=3, crs='EPSG:28992', network_to_network=False):
     """
@@ -207,10 +355,9 @@ def connect_curb_crossing_edge(gdf_source_nodes, gdf_target_nodes, walking_graph
     Returns:
     GeoDataFrame representing connected edges.
     """
-    dist_sort, dist_argsort = get_distance_matrices(gdf_source_nodes, gdf_target_nodes)
-    nodes_to_connect = get_nodes_to_connect(dist_sort, dist_argsort, max_dist=max_dist)
+    nodes_to_connect = get_nearby_nodes(gdf_source_nodes, gdf_target_nodes, max_dist=max_dist)
     edges, _ = create_edges_geometries(gdf_source_nodes, gdf_target_nodes, nodes_to_connect,
-                                       dist_sort, max_connections=max_connections)
+                                       max_connections=max_connections)
 
     if len(edges) == 2:
         try:
@@ -246,6 +393,78 @@ def connect_curb_crossing_edge(gdf_source_nodes, gdf_target_nodes, walking_graph
         return gpd.GeoDataFrame()
 
 
+def connect_curb_crossing_edges(gdf_curb_edges, gdf_target_nodes, walking_graph, max_dist=20,
+                                min_path_length=20, crs='EPSG:28992', network_to_network=False):
+    """
+    Connect all curb crossing edges to the network at once.
+
+    Gives the same result as calling connect_curb_crossing_edge with max_connections=1 on
+    the end points of each curb edge and concatenating the results without duplicates. The
+    end points are snapped with one KD-tree query and the network distance test uses
+    searches limited to min_path_length, shared between edges with the same start node.
+
+    Parameters:
+    - gdf_curb_edges (GeoDataFrame): GeoDataFrame of curb crossing edges.
+    - gdf_target_nodes (GeoDataFrame): GeoDataFrame of target nodes.
+    - walking_graph (networkx.Graph): Walking graph.
+    - max_dist (float): Maximum distance for connections.
+    - min_path_length (int): Target nodes are only connected if they are more than
+      min_path_length edges apart on the walking graph (or not connected by it).
+    - crs (str): Coordinate Reference System.
+    - network_to_network (bool): Whether to connect network to network.
+
+    Returns:
+    GeoDataFrame representing connected edges.
+    """
+    source_coords = np.array([line.coords[i][:2] for line in gdf_curb_edges.geometry
+                              for i in (0, -1)], dtype=float).reshape(-1, 2)
+    target_coords = gdf_target_nodes[['x', 'y']].values
+    if len(source_coords) == 0 or len(target_coords) == 0:
+        return gpd.GeoDataFrame(geometry=[], crs=crs)
+
+    # Nearest target node of each end point. As in connect_curb_crossing_edge, the first
+    # and second end point are never connected to the first and second target node.
+    candidates = cKDTree(target_coords).query_ball_point(source_coords, max_dist)
+    point = np.repeat(np.arange(len(source_coords)), [len(c) for c in candidates])
+    target = np.concatenate([np.asarray(c, dtype=int) for c in candidates])
+    dist = np.linalg.norm(target_coords[target] - source_coords[point], axis=1)
+    keep = (dist > 0) & (dist < max_dist) & (target != point % 2)
+    point, target, dist = point[keep], target[keep], dist[keep]
+    order = np.lexsort((target, dist, point))
+    first = order[np.r_[True, point[order][1:] != point[order][:-1]]] if len(order) else order
+    nearest = np.full(len(source_coords), -1)
+    nearest[point[first]] = target[first]
+    pair_nearest = nearest.reshape(-1, 2)
+
+    # Only connect crossing edge if target nodes are in different connected components
+    # or the target nodes are more than min_path_length edges apart from eachother.
+    nearby_nodes, connect = {}, np.zeros(len(pair_nearest), dtype=bool)
+    target_points = get_point_coords(gdf_target_nodes)
+    target_nodes = [tuple(coords) for coords in target_points.tolist()]
+    for pair in np.flatnonzero((pair_nearest >= 0).all(axis=1)):
+        node_1, node_2 = (target_nodes[node] for node in pair_nearest[pair])
+        if node_1 not in nearby_nodes:
+            try:
+                nearby_nodes[node_1] = nx.single_source_shortest_path_length(
+                    walking_graph, node_1, cutoff=min_path_length)
+            except nx.NodeNotFound:
+                nearby_nodes[node_1] = {}
+        connect[pair] = node_2 not in nearby_nodes[node_1]
+
+    pair_nearest = pair_nearest[connect]
+    pair_source = source_coords.reshape(-1, 2, 2)[connect]
+    pair_target = target_points[pair_nearest]
+    if network_to_network:
+        start_coords, end_coords = pair_target[:, 0], pair_target[:, 1]
+    else:
+        start_coords = np.stack([pair_source[:, 0], pair_source[:, 1], pair_source[:, 0]], axis=1)
+        end_coords = np.stack([pair_target[:, 0], pair_target[:, 1], pair_source[:, 1]], axis=1)
+        start_coords, end_coords = start_coords.reshape(-1, 2), end_coords.reshape(-1, 2)
+
+    gdf_edges = gpd.GeoDataFrame(geometry=create_lines(start_coords, end_coords), crs=crs)
+    return gdf_edges[~gdf_edges.geometry.to_wkb().duplicated()].reset_index(drop=True)
+
+
 def count_line_gdf_intersections(line, gdf, geom_column='geometry'):
     """
     Count intersections between a line and a GeoDataFrame of lines.
@@ -272,3 +491,81 @@ def count_line_gdf_intersections(line, gdf, geom_column='geometry'):
             count += len(intersections)
 
     return count
+
+
+def count_lines_gdf_intersections(lines, gdf, geom_column='geometry'):
+    """
+    Count intersections between many lines and a GeoDataFrame of lines.
+
+    Gives the same counts as count_line_gdf_intersections per line, but only intersects the
+    pairs of lines found with the spatial index of the GeoDataFrame.
+
+    Parameters:
+    - lines (GeoSeries): Lines to count intersections.
+    - gdf (GeoDataFrame): GeoDataFrame of lines.
+    - geom_column (str): Column name containing geometries.
+
+    Returns:
+    NumPy array with the count of intersections for each line.
+    """
+    lines = gpd.GeoSeries(lines.values if hasattr(lines, 'values') else lines)
+    others = gpd.GeoSeries(gdf[geom_column].values)
+    line_idx, other_idx = others.sindex.query(lines.values, predicate='intersects')
+    intersections = lines.iloc[line_idx].reset_index(drop=True).intersection(
+        others.iloc[other_idx].reset_index(drop=True))
+
+    geom_type = intersections.geom_type.values
+    counts = np.where(geom_type == 'Point', 1, 0)
+    is_multi_point = geom_type == 'MultiPoint'
+    counts[is_multi_point] = [len(points.geoms) for points in intersections[is_multi_point]]
+    return np.bincount(line_idx, weights=counts, minlength=len(lines)).astype(int)
+
+
+def get_curbs_between_polygons(gdf_curbs, gdf_polygons):
+    """
+    Get the curbs that intersect some, but not all, of the polygons, using a spatial index.
+
+    Parameters:
+    - gdf_curbs (GeoDataFrame): GeoDataFrame of curbs.
+    - gdf_polygons (GeoDataFrame): GeoDataFrame of polygons, e.g. bike paths.
+
+    Returns:
+    GeoDataFrame with the curbs that intersect at least one and not all polygons.
+    """
+    curb_idx, _ = gdf_polygons.sindex.query(gdf_curbs.geometry.values, predicate='intersects')
+    counts = np.bincount(curb_idx, minlength=len(gdf_curbs))
+    return gdf_curbs.loc[(counts > 0) & (counts < len(gdf_polygons))]
+
+
+def get_walk_bike_connections(walking_edges, cycling_edges, gdf_walking_nodes, gdf_bike_nodes,
+                              crs='EPSG:28992'):
+    """
+    Connect walking nodes directly to bike nodes that are connected to the same curb node.
+
+    Parameters:
+    - walking_edges (list): Edges [curb node, walking node] from get_connections.
+    - cycling_edges (list): Edges [curb node, bike node] from get_connections.
+    - gdf_walking_nodes (GeoDataFrame): GeoDataFrame of walking nodes.
+    - gdf_bike_nodes (GeoDataFrame): GeoDataFrame of bike nodes.
+    - crs (str): Coordinate Reference System.
+
+    Returns:
+    GeoDataFrame of connection edges with the coordinates of the walking node and bike node
+    and the length, ordered by walking edge and cycling edge.
+    """
+    df_walking_edges = pd.DataFrame(np.asarray(walking_edges, dtype=int).reshape(-1, 2),
+                                    columns=['curb', 'walk'])
+    df_cycling_edges = pd.DataFrame(np.asarray(cycling_edges, dtype=int).reshape(-1, 2),
+                                    columns=['curb', 'cycle'])
+    df_edges = df_walking_edges.reset_index().merge(
+        df_cycling_edges.reset_index(), on='curb', suffixes=('_walk', '_cycle'))
+    df_edges = df_edges.sort_values(['index_walk', 'index_cycle'])
+
+    walk_coords = get_point_coords(gdf_walking_nodes)[df_edges['walk'].values]
+    cycle_coords = get_point_coords(gdf_bike_nodes)[df_edges['cycle'].values]
+    gdf_connection_edges = gpd.GeoDataFrame(geometry=create_lines(walk_coords, cycle_coords),
+                                            crs=crs)
+    gdf_connection_edges['walk_node'] = [tuple(coords) for coords in walk_coords.tolist()]
+    gdf_connection_edges['cycle_node'] = [tuple(coords) for coords in cycle_coords.tolist()]
+    gdf_connection_edges['length'] = gdf_connection_edges['geometry'].length
+    return gdf_connection_edges
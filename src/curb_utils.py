@@ -1,12 +1,21 @@
 import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from upcp.labels import Labels
 from upcp.utils import clip_utils
 from shapely.geometry import MultiPoint
 from shapely.ops import split, snap
+from scipy.spatial import cKDTree
 import numpy as np
+import pandas as pd
+import geopandas as gpd
 
 import curb_utils
+import las_utils
+import poly_utils
+
+CURB_HEIGHT_COLUMNS = ['line_segm', 'line_segm_polygon', 'overarching_line_segm', 'curb_height']
 
 
 def create_mask(points, labels, polygons):
@@ -79,6 +88,111 @@ def calculate_curb_height(points, labels, segment_polygon, min_nr_points):
     return curb_height, available_points
 
 
+def get_points_in_polygons(points, point_polygon, polygons):
+    """
+    Check for pairs of a point and a polygon whether the point lies inside the polygon.
+
+    Uses even-odd ray casting on the polygon exteriors, one edge index at a time for all pairs.
+
+    Parameters:
+    - points (numpy.ndarray): Array of 2D point coordinates, one per pair.
+    - point_polygon (numpy.ndarray): Index of the polygon for each pair.
+    - polygons (list): List of Polygons.
+
+    Returns:
+    numpy.ndarray: Boolean mask for the pairs.
+    """
+    rings = [np.asarray(polygon.exterior.coords)[:, :2] for polygon in polygons]
+    n_edges = np.array([len(ring) - 1 for ring in rings])
+    edge_start = np.concatenate([[0], np.cumsum(n_edges)[:-1]])
+    edge_from = np.concatenate([ring[:-1] for ring in rings])
+    edge_to = np.concatenate([ring[1:] for ring in rings])
+
+    inside = np.zeros(len(points), dtype=bool)
+    x, y = points[:, 0], points[:, 1]
+    for k in range(n_edges.max(initial=0)):
+        pairs = np.where(n_edges[point_polygon] > k)[0]
+        edge = edge_start[point_polygon[pairs]] + k
+        (x1, y1), (x2, y2) = edge_from[edge].T, edge_to[edge].T
+        px, py = x[pairs], y[pairs]
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = (x2 - x1) * (py - y1) / (y2 - y1) + x1
+        inside[pairs[crosses & (px < x_cross)]] ^= True
+    return inside
+
+
+def get_grouped_medians(values, groups, n_groups):
+    """
+    Calculate the median of values per group.
+
+    Parameters:
+    - values (numpy.ndarray): Array of values.
+    - groups (numpy.ndarray): Group index for each value.
+    - n_groups (int): Number of groups.
+
+    Returns:
+    Tuple (numpy.ndarray, numpy.ndarray): Median and number of values per group, the median is
+    NaN for empty groups.
+    """
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    medians = np.full(n_groups, np.nan)
+    has_values = counts > 0
+    lower = starts[has_values] + (counts[has_values] - 1) // 2
+    upper = starts[has_values] + counts[has_values] // 2
+    medians[has_values] = (values[lower] + values[upper]) / 2
+    return medians, counts
+
+
+def calculate_curb_heights(points, labels, segment_polygons, min_nr_points):
+    """
+    Calculate curb heights for many segment polygons of a tile at once.
+
+    Gives the same result as calculate_curb_height per polygon, but assigns the labelled points
+    to all polygons in one pass using a KD-tree over the GROUND and ROAD points.
+
+    Parameters:
+    - points (numpy.ndarray): Array of points.
+    - labels (numpy.ndarray): Array of labels for each point.
+    - segment_polygons (list): List of Polygons defining the segments.
+    - min_nr_points (int): Minimum number of points needed for calculation.
+
+    Returns:
+    tuple: Arrays with the curb height and whether there are enough points for calculation,
+    for each segment polygon.
+    """
+    n_polygons = len(segment_polygons)
+    curb_heights = np.full(n_polygons, np.nan)
+    mask = (labels == Labels.GROUND) | (labels == Labels.ROAD)
+    points, labels = points[mask], labels[mask]
+    if n_polygons == 0 or len(points) == 0:
+        return curb_heights, np.zeros(n_polygons, dtype=bool)
+
+    # Candidate points within the circle around the bounding box of each polygon.
+    bounds = np.array([polygon.bounds for polygon in segment_polygons])
+    centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+    radii = np.hypot(*(bounds[:, 2:] - bounds[:, :2]).T) / 2
+    candidates = cKDTree(points[:, :2]).query_ball_point(centers, radii)
+    pair_polygon = np.repeat(np.arange(n_polygons), [len(c) for c in candidates])
+    pair_point = np.concatenate([np.asarray(c, dtype=int) for c in candidates])
+
+    inside = get_points_in_polygons(points[pair_point, :2], pair_polygon, segment_polygons)
+    pair_polygon, pair_point = pair_polygon[inside], pair_point[inside]
+    z_values = points[pair_point, -1]
+    is_road = labels[pair_point] == Labels.ROAD
+
+    road_height, n_road = get_grouped_medians(z_values[is_road], pair_polygon[is_road],
+                                              n_polygons)
+    sidewalk_height, n_sidewalk = get_grouped_medians(z_values[~is_road], pair_polygon[~is_road],
+                                                      n_polygons)
+    available_points = (n_road > min_nr_points) & (n_sidewalk > min_nr_points)
+    curb_heights[available_points] = (sidewalk_height - road_height)[available_points]
+    return curb_heights, available_points
+
+
 def get_height_color(curb_height, available_points, min_h):
     """
     Get color based on curb height and availability of points.
@@ -132,3 +246,171 @@ def split_line_by_point(line, point, tolerance: float = 1):
     GeometryCollection: Collection of LineString objects.
     """
     return split(snap(line, point, tolerance), point)
+
+
+def get_line_segments(lines, distance_delta):
+    """
+    Cut many LineStrings in segments of length distance_delta at once.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+    - distance_delta (float): Length of the segments.
+
+    Returns:
+    Tuple (segments, parent_index) with a NumPy array of segments, ordered by line and along
+    each line, and the index of the line each segment was cut from. The last segment of each
+    line holds the remaining length.
+    """
+    lines = gpd.GeoSeries(list(lines))
+    if len(lines) == 0:
+        return np.empty(0, dtype=object), np.empty(0, dtype=int)
+    n_cuts = np.maximum(np.ceil(lines.length.values / distance_delta).astype(int) - 1, 0)
+    cut_line_index = np.repeat(np.arange(len(lines)), n_cuts)
+    cut_rank = np.arange(len(cut_line_index)) - np.repeat(np.cumsum(n_cuts) - n_cuts, n_cuts)
+    return poly_utils.split_lines_at_distances(lines.values, cut_line_index,
+                                               (cut_rank + 1) * distance_delta)
+
+
+def segment_lines(gdf_lines, distance_delta):
+    """
+    Cut the lines of a GeoDataFrame in segments of length distance_delta.
+
+    Parameters:
+    - gdf_lines (GeoDataFrame): GeoDataFrame with LineStrings.
+    - distance_delta (float): Length of the segments.
+
+    Returns:
+    GeoDataFrame: One row per segment, with the index and attributes of the line it was
+    cut from.
+    """
+    segments, parent_index = get_line_segments(gdf_lines.geometry.values, distance_delta)
+    gdf_segments = gdf_lines.iloc[parent_index].copy()
+    gdf_segments[gdf_lines.geometry.name] = gpd.GeoSeries(segments, index=gdf_segments.index,
+                                                          crs=gdf_lines.crs)
+    return gdf_segments
+
+
+def get_segment_polygons(lines, distance_delta, buffer_distance=0.5):
+    """
+    Split lines in segments and create a polygon on both sides of each segment.
+
+    Parameters:
+    - lines (list of shapely.geometry.LineString): Input LineStrings.
+    - distance_delta (float): Length of the segments.
+    - buffer_distance (float): Width of the polygon on each side of the segment.
+
+    Returns:
+    tuple: Lists of segments and their polygons and the index of the line each segment is
+    part of, segments shorter than half of distance_delta are left out.
+    """
+    segments, parent_index = get_line_segments(lines, distance_delta)
+    segments = gpd.GeoSeries(segments)
+    keep = (segments.length >= (distance_delta / 2)).values
+    segments, parent_index = segments[keep], parent_index[keep]
+    polygons = segments.buffer(buffer_distance, single_sided=True).union(
+        segments.buffer(-buffer_distance, single_sided=True))
+    return list(segments), list(polygons), parent_index
+
+
+def calculate_tile_curb_heights(filename, potential_crossing_lines, distance_delta,
+                                min_nr_points, cache_folder=None):
+    """
+    Calculate curb heights for the segments of the potential crossing lines in a tile.
+
+    Parameters:
+    - filename (str): Path to the labelled point cloud of the tile.
+    - potential_crossing_lines: LineString or MultiLineString of potential crossing lines.
+    - distance_delta (float): Length of the segments.
+    - min_nr_points (int): Minimum number of points needed for calculation.
+    - cache_folder (str): Folder for memory-mapped point cloud caches, or None to not cache.
+
+    Returns:
+    dict: Columns with the segments, their polygons (WKT), the line they are part of (WKT)
+    and the curb height.
+    """
+    points, labels = las_utils.read_las_bbox(
+        filename, potential_crossing_lines.buffer(0.5).bounds, cache_folder)
+
+    lines = getattr(potential_crossing_lines, 'geoms', [potential_crossing_lines])
+    lines = [line for line in lines if line.geom_type == 'LineString']
+    segments, segment_polygons, parent_index = get_segment_polygons(lines, distance_delta)
+    lines_wkt = [line.wkt for line in lines]
+    columns = {'line_segm': segments,
+               'line_segm_polygon': [polygon.wkt for polygon in segment_polygons],
+               'overarching_line_segm': [lines_wkt[i] for i in parent_index]}
+
+    # Segments with a polygon in multiple parts get curb height 0.
+    is_polygon = np.array([polygon.geom_type == 'Polygon' for polygon in segment_polygons],
+                          dtype=bool)
+    curb_heights = np.zeros(len(segment_polygons))
+    curb_heights[is_polygon], _ = calculate_curb_heights(
+        points, labels, [p for p, keep in zip(segment_polygons, is_polygon) if keep],
+        min_nr_points)
+    columns['curb_height'] = curb_heights
+    return columns
+
+
+_worker_args = None
+
+
+def _init_worker(*args):
+    global _worker_args
+    _worker_args = args
+
+
+def _tile_curb_heights_worker(tile):
+    tilecode, filename, potential_crossing_lines = tile
+    distance_delta, min_nr_points, cache_folder = _worker_args
+    start_time = time.perf_counter()
+    try:
+        columns = calculate_tile_curb_heights(filename, potential_crossing_lines,
+                                              distance_delta, min_nr_points, cache_folder)
+        error = None
+    except Exception as e:
+        columns, error = None, f'{type(e).__name__}: {e}'
+    return tilecode, columns, error, time.perf_counter() - start_time
+
+
+def get_curb_heights(tiles_bgt_dict, distance_delta, min_nr_points, n_workers=None,
+                     cache_folder=None):
+    """
+    Calculate curb heights for all tiles with potential crossing lines, in parallel per tile.
+
+    Parameters:
+    - tiles_bgt_dict (dict): Tile information per tilecode, with 'filename' and
+      'potential_crossing_lines'.
+    - distance_delta (float): Length of the segments.
+    - min_nr_points (int): Minimum number of points needed for calculation.
+    - n_workers (int): Number of worker processes, None for the number of processors and 1 to
+      run in the current process.
+    - cache_folder (str): Folder for memory-mapped point cloud caches, or None to not cache.
+
+    Returns:
+    tuple: DataFrame with the curb height per segment, and a DataFrame with per tile the
+    number of segments, the error if the tile failed and the processing time in seconds.
+    """
+    tiles = [(tilecode, values['filename'], values['potential_crossing_lines'])
+             for tilecode, values in tiles_bgt_dict.items()
+             if values['potential_crossing_lines']]
+    args = (distance_delta, min_nr_points, cache_folder)
+
+    if n_workers == 1:
+        _init_worker(*args)
+        results = [_tile_curb_heights_worker(tile) for tile in tiles]
+    else:
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=args) as executor:
+            results = list(executor.map(_tile_curb_heights_worker, tiles))
+
+    columns = {column: [] for column in CURB_HEIGHT_COLUMNS}
+    for _, tile_columns, _, _ in results:
+        if tile_columns is not None:
+            for column in CURB_HEIGHT_COLUMNS:
+                columns[column].extend(tile_columns[column])
+    curb_height_df = pd.DataFrame(columns, columns=CURB_HEIGHT_COLUMNS)
+    curb_height_df['curb_height'] = curb_height_df['curb_height'].astype(float)
+
+    tile_log = pd.DataFrame(
+        [(tilecode, len(tile_columns['line_segm']) if tile_columns is not None else 0,
+          error, seconds) for tilecode, tile_columns, error, seconds in results],
+        columns=['tilecode', 'n_segments', 'error', 'seconds'])
+    return curb_height_df, tile_log
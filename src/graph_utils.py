@@ -0,0 +1,671 @@
+import hashlib
+import heapq
+import math
+import operator
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+
+class CSRGraph:
+    """
+    Directed routing graph with integer node ids and compressed sparse row (CSR) adjacency.
+
+    Nodes are the unique end points of the network lines. Edges are the network lines (one
+    per row of the network GeoDataFrame) and their attributes are kept as NumPy arrays
+    indexed by edge id. Arcs are the traversable directions of the edges: one for oneway
+    edges and two for the others. The outgoing arcs of node `u` are
+    `indptr[u]:indptr[u + 1]`, with head node `arc_head` and edge id `arc_edge`.
+    """
+
+    def __init__(self, node_coords, edge_nodes, oneway, edge_data):
+        self.node_x = np.ascontiguousarray(node_coords[:, 0], dtype=float)
+        self.node_y = np.ascontiguousarray(node_coords[:, 1], dtype=float)
+        self.edge_nodes = edge_nodes.astype(np.int32)
+        self.edge_data = edge_data
+
+        edge_ids = np.arange(len(edge_nodes), dtype=np.int32)
+        both_ways = ~np.asarray(oneway, dtype=bool)
+        tails = np.concatenate([edge_nodes[:, 0], edge_nodes[both_ways, 1]])
+        heads = np.concatenate([edge_nodes[:, 1], edge_nodes[both_ways, 0]])
+        edges = np.concatenate([edge_ids, edge_ids[both_ways]])
+
+        order = np.argsort(tails, kind='stable')
+        self.arc_head = heads[order].astype(np.int32)
+        self.arc_edge = edges[order]
+        self.indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(np.bincount(tails, minlength=self.n_nodes))
+
+    @classmethod
+    def from_gdf(cls, gdf, edge_columns, oneway_column=None):
+        """
+        Create a graph from a GeoDataFrame of LineStrings.
+
+        Parameters:
+        - gdf (GeoDataFrame): Network edges, lines sharing end point coordinates are connected.
+        - edge_columns (dict): Mapping of edge attribute names to NumPy dtypes to store.
+        - oneway_column (str): Boolean column, True if an edge can only be traversed in the
+          direction of its geometry. If None, all edges are bi-directional.
+
+        Returns:
+        CSRGraph: Graph where edge id i corresponds to row i of the GeoDataFrame.
+        """
+        geoms = gdf.geometry.values
+        endpoints = np.hstack([shapely.get_coordinates(shapely.get_point(geoms, 0)),
+                               shapely.get_coordinates(shapely.get_point(geoms, -1))])
+        node_coords, edge_nodes = np.unique(endpoints.reshape(-1, 2), axis=0,
+                                            return_inverse=True)
+        edge_nodes = edge_nodes.reshape(-1, 2)
+        if oneway_column is None:
+            oneway = np.zeros(len(gdf), dtype=bool)
+        else:
+            oneway = gdf[oneway_column].to_numpy(dtype=bool)
+        edge_data = {column: gdf[column].to_numpy(dtype=dtype)
+                     for column, dtype in edge_columns.items()}
+        return cls(node_coords, edge_nodes, oneway, edge_data)
+
+    def to_sparse(self, weight):
+        """
+        Get the graph as a SciPy sparse matrix, keeping the cheapest of parallel arcs.
+
+        Parameters:
+        - weight (numpy.ndarray): Weight per edge id.
+
+        Returns:
+        scipy.sparse.csr_matrix: Matrix of shape (n_nodes, n_nodes) with arc weights.
+        """
+        tails = np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+        arc_weight = weight[self.arc_edge]
+        order = np.lexsort((arc_weight, self.arc_head, tails))
+        tails, heads, arc_weight = tails[order], self.arc_head[order], arc_weight[order]
+        first = np.ones(len(tails), dtype=bool)
+        first[1:] = (tails[1:] != tails[:-1]) | (heads[1:] != heads[:-1])
+        return csr_matrix((arc_weight[first], (tails[first], heads[first])),
+                          shape=(self.n_nodes, self.n_nodes))
+
+    @property
+    def n_nodes(self):
+        """Number of nodes."""
+        return len(self.node_x)
+
+    @property
+    def n_edges(self):
+        """Number of edges."""
+        return len(self.edge_nodes)
+
+    @property
+    def node_coords(self):
+        """Node coordinates of shape (n_nodes, 2)."""
+        return np.column_stack([self.node_x, self.node_y])
+
+    @property
+    def checksum(self):
+        """Checksum of the nodes and arcs, to check that stored data belongs to the graph."""
+        return get_checksum([self.node_x, self.node_y, self.edge_nodes, self.indptr,
+                             self.arc_head, self.arc_edge])
+
+
+def get_checksum(arrays):
+    """
+    Get a checksum of the contents of NumPy arrays.
+
+    Parameters:
+    - arrays (list of numpy.ndarray): Arrays to include.
+
+    Returns:
+    str: Hexadecimal SHA-1 checksum.
+    """
+    checksum = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        checksum.update(str((array.dtype.str, array.shape)).encode())
+        checksum.update(array.tobytes())
+    return checksum.hexdigest()
+
+
+def get_accessible_mask(curb_height_max, obstacle_free_width, max_curb_height,
+                        min_sidewalk_width):
+    """
+    Get a mask of edges that can be used given the hard limits of a user profile.
+
+    Parameters:
+    - curb_height_max (numpy.ndarray): Maximum curb height per edge (in meters).
+    - obstacle_free_width (numpy.ndarray): Obstacle free width per edge (in meters).
+    - max_curb_height (float): Maximum curb height when crossing the street (in meters).
+    - min_sidewalk_width (float): Minimum width of sidewalks (in meters).
+
+    Returns:
+    numpy.ndarray: Boolean mask of accessible edges. Unknown values do not exclude an edge.
+    """
+    return ~((curb_height_max > max_curb_height) | (obstacle_free_width < min_sidewalk_width))
+
+
+def get_heuristic(graph, targets=None, target_point=None, heuristic_factor=0, landmarks=None):
+    """
+    Get the A* heuristic of a search, the largest of the euclidean and landmark bounds.
+
+    Parameters:
+    - graph (CSRGraph): Routing graph.
+    - targets (dict): Extra cost to reach the destination per target node id.
+    - target_point (tuple): Destination coordinates (x, y) for the euclidean bound.
+    - heuristic_factor (float): Factor by which the euclidean distance to the target point
+      never overestimates the weight. If 0, the euclidean bound is not used.
+    - landmarks (Landmarks): Landmark distances for the same weight, used as ALT bound
+      towards the targets.
+
+    Returns:
+    function: Lower bound on the cost from a node to the destination, 0 without bounds.
+    """
+    heuristics = []
+    if heuristic_factor and target_point is not None:
+        node_x, node_y = memoryview(graph.node_x), memoryview(graph.node_y)
+        target_x, target_y = target_point
+
+        def euclidean_heuristic(node):
+            return math.hypot(node_x[node] - target_x, node_y[node] - target_y) * heuristic_factor
+        heuristics.append(euclidean_heuristic)
+    if landmarks is not None and targets is not None:
+        heuristics.append(landmarks.get_heuristic(targets))
+
+    if len(heuristics) == 2:
+        def heuristic(node):
+            return max(heuristics[0](node), heuristics[1](node))
+        return heuristic
+    if len(heuristics) == 1:
+        return heuristics[0]
+    return lambda node: 0
+
+
+class StoppingRule:
+    """
+    Decide when a search can stop, from the nodes it settles in order of cost.
+
+    A search towards targets can stop once the cheapest destination is known, a search with
+    nodes to settle once all of them are settled. Otherwise the full shortest path tree
+    is computed.
+    """
+
+    def __init__(self, targets=None, settle=None):
+        self.targets = targets
+        self.remaining = None if settle is None else set(settle)
+        self.best_total, self.best_target = math.inf, None
+
+    def is_done(self, key):
+        """
+        Check whether the search can stop before settling the next node.
+
+        Parameters:
+        - key (float): Cost plus heuristic of the next node.
+
+        Returns:
+        bool: True if no node left can lead to a cheaper destination.
+        """
+        return key >= self.best_total
+
+    def settle(self, node, cost):
+        """
+        Register a settled node.
+
+        Parameters:
+        - node (int): Settled node id.
+        - cost (float): Cost of the node.
+
+        Returns:
+        bool: True if all nodes to settle are settled.
+        """
+        if self.targets is not None and node in self.targets:
+            total = cost + self.targets[node]
+            if total < self.best_total:
+                self.best_total, self.best_target = total, node
+        if self.remaining is None:
+            return False
+        self.remaining.discard(node)
+        return not self.remaining
+
+
+def relax_arcs(node, cost, arcs, weight, heuristic, dist, pred, heap):
+    """
+    Relax the accessible outgoing arcs of a settled node.
+
+    Parameters:
+    - node (int): Settled node id.
+    - cost (float): Cost of the node.
+    - arcs (tuple): Memoryviews (indptr, arc_head, arc_edge, accessible) of the graph
+      arrays and the accessible mask per edge id.
+    - weight (memoryview): Weight per edge id.
+    - heuristic (function): Lower bound on the cost from a node to the destination.
+    - dist (dict): Cost per reached node, updated in place.
+    - pred (dict): Predecessor (node, edge id) per reached node, updated in place.
+    - heap (list): Priority queue of (cost + heuristic, cost, node), updated in place.
+    """
+    indptr, arc_head, arc_edge, accessible = arcs
+    for arc in range(indptr[node], indptr[node + 1]):
+        edge = arc_edge[arc]
+        if not accessible[edge]:
+            continue
+        new_cost = cost + weight[edge]
+        head = arc_head[arc]
+        if new_cost < dist.get(head, math.inf):
+            dist[head] = new_cost
+            pred[head] = (node, edge)
+            heapq.heappush(heap, (new_cost + heuristic(head), new_cost, head))
+
+
+def search(graph, sources, weight, targets=None, target_point=None, max_curb_height=np.inf,
+           min_sidewalk_width=-np.inf, heuristic_factor=0, landmarks=None, settle=None):
+    """
+    Dijkstra or A* search on a CSR graph that skips edges which are not accessible.
+
+    Parameters:
+    - graph (CSRGraph): Graph with 'curb_height_max' and 'obstacle_free_width_float' edge data.
+    - sources (dict): Initial cost per source node id.
+    - weight (numpy.ndarray): Weight per edge id.
+    - targets (dict): Extra cost to reach the destination per target node id. The search
+      stops once the cheapest destination is known. If None, the full shortest path tree
+      from the sources is computed.
+    - target_point (tuple): Destination coordinates (x, y) used by the A* heuristic.
+    - max_curb_height (float): Edges with a higher curb height are skipped.
+    - min_sidewalk_width (float): Edges with a smaller obstacle free width are skipped.
+    - heuristic_factor (float): Factor by which the euclidean distance to the target point
+      never overestimates the weight. If 0, a plain Dijkstra search is performed.
+    - landmarks (Landmarks): Landmark distances for the same weight, used as ALT heuristic
+      towards the targets.
+    - settle (iterable): Node ids after which the search stops once all of them are settled.
+
+    Returns:
+    Tuple (dist, pred, best_target) with the cost of each reached node, the (node, edge id)
+    it was reached from and the target node of the cheapest destination (None if no
+    target was reached).
+    """
+    heuristic = get_heuristic(graph, targets, target_point, heuristic_factor, landmarks)
+    accessible = get_accessible_mask(graph.edge_data['curb_height_max'],
+                                     graph.edge_data['obstacle_free_width_float'],
+                                     max_curb_height, min_sidewalk_width)
+    # Memoryviews give fast element access that returns Python scalars.
+    arcs = (memoryview(graph.indptr), memoryview(graph.arc_head), memoryview(graph.arc_edge),
+            memoryview(accessible))
+    weight = memoryview(np.ascontiguousarray(weight, dtype=float))
+    stopping_rule = StoppingRule(targets, settle)
+
+    dist, pred, settled = dict(sources), dict.fromkeys(sources), set()
+    heap = [(cost + heuristic(node), cost, node) for node, cost in sources.items()]
+    heapq.heapify(heap)
+    while heap:
+        key, cost, node = heapq.heappop(heap)
+        if stopping_rule.is_done(key):
+            break
+        if node in settled:
+            continue
+        settled.add(node)
+        if stopping_rule.settle(node, cost):
+            break
+        relax_arcs(node, cost, arcs, weight, heuristic, dist, pred, heap)
+    return dist, pred, stopping_rule.best_target
+
+
+def get_path(pred, target):
+    """
+    Get the path to a target from a search predecessor dict.
+
+    Parameters:
+    - pred (dict): Predecessor (node, edge id) per node, as returned by search.
+    - target (int): Target node id.
+
+    Returns:
+    Tuple (source node id, list of edge ids) of the path, (None, None) if the target was
+    not reached.
+    """
+    if target not in pred:
+        return None, None
+    edges = []
+    while pred[target] is not None:
+        target, edge = pred[target]
+        edges.append(edge)
+    return target, edges[::-1]
+
+
+def shortest_path(graph, source, target, weight, max_curb_height=np.inf,
+                  min_sidewalk_width=-np.inf, heuristic_factor=0, landmarks=None):
+    """
+    Get the shortest accessible path between two nodes.
+
+    Parameters:
+    - graph (CSRGraph): Routing graph.
+    - source (int): Source node id.
+    - target (int): Target node id.
+    - weight (numpy.ndarray): Weight per edge id.
+    - max_curb_height (float): Edges with a higher curb height are skipped.
+    - min_sidewalk_width (float): Edges with a smaller obstacle free width are skipped.
+    - heuristic_factor (float): A* heuristic factor, 0 for Dijkstra.
+    - landmarks (Landmarks): Landmark distances for the same weight for an ALT search.
+
+    Returns:
+    Tuple (cost, edge ids) of the path, (inf, None) if there is no path.
+    """
+    target_point = (graph.node_x[target], graph.node_y[target])
+    dist, pred, _ = search(graph, {source: 0.0}, weight, targets={target: 0.0},
+                           target_point=target_point, max_curb_height=max_curb_height,
+                           min_sidewalk_width=min_sidewalk_width,
+                           heuristic_factor=heuristic_factor, landmarks=landmarks)
+    return dist.get(target, math.inf), get_path(pred, target)[1]
+
+
+class Landmarks:
+    """
+    Landmark distances for A*, landmarks and triangle inequality (ALT) searches.
+
+    For every node the distances from and to a small set of landmark nodes are stored for
+    one weight. By the triangle inequality they give a lower bound on the distance between
+    any two nodes. Landmark distances are computed on the full graph, so the bounds remain
+    valid when the search skips edges that are not accessible for a user profile.
+    """
+
+    # Finite stand-in for unreachable nodes, keeps the bound arithmetic free of NaNs.
+    UNREACHABLE = 1e30
+
+    def __init__(self, landmarks, dist_from, dist_to):
+        self.landmarks = landmarks
+        self.dist_from = np.minimum(dist_from, self.UNREACHABLE).astype(np.float32)
+        self.dist_to = np.minimum(dist_to, self.UNREACHABLE).astype(np.float32)
+        # Bounds are lowered by the float32 rounding error to keep them admissible.
+        reachable = np.concatenate([self.dist_from[self.dist_from < self.UNREACHABLE],
+                                    self.dist_to[self.dist_to < self.UNREACHABLE], [0]])
+        self.tolerance = 4 * float(np.finfo(np.float32).eps) * float(reachable.max())
+
+    @classmethod
+    def build(cls, graph, weight, n_landmarks=8, seed=0):
+        """
+        Select landmarks by farthest point selection and compute their distances.
+
+        Parameters:
+        - graph (CSRGraph): Routing graph.
+        - weight (numpy.ndarray): Weight per edge id.
+        - n_landmarks (int): Number of landmarks.
+        - seed (int): Seed for the random start node.
+
+        Returns:
+        Landmarks: Landmark distances for the weight.
+        """
+        matrix = graph.to_sparse(weight)
+        n_landmarks = min(n_landmarks, graph.n_nodes)
+        start = np.random.default_rng(seed).integers(graph.n_nodes)
+
+        # Unreachable nodes count as farthest, so every component gets landmarks.
+        min_dist = dijkstra(matrix, directed=False, indices=start)
+        landmarks = []
+        for _ in range(n_landmarks):
+            landmark = int(np.argmax(np.nan_to_num(min_dist, posinf=np.finfo(float).max)))
+            landmarks.append(landmark)
+            min_dist = np.minimum(min_dist, dijkstra(matrix, directed=False, indices=landmark))
+
+        dist_from = dijkstra(matrix, directed=True, indices=landmarks)
+        dist_to = dijkstra(matrix.T.tocsr(), directed=True, indices=landmarks)
+        return cls(np.array(landmarks), np.ascontiguousarray(dist_from.T, dtype=np.float32),
+                   np.ascontiguousarray(dist_to.T, dtype=np.float32))
+
+    @classmethod
+    def load(cls, file, prefix=''):
+        """
+        Load landmark distances stored with save.
+
+        Parameters:
+        - file (str or numpy.lib.npyio.NpzFile): Path to or opened .npz file.
+        - prefix (str): Prefix of the arrays in the file.
+
+        Returns:
+        Landmarks: Landmark distances.
+        """
+        data = np.load(file) if isinstance(file, str) else file
+        return cls(data[f'{prefix}landmarks'], data[f'{prefix}dist_from'],
+                   data[f'{prefix}dist_to'])
+
+    def to_dict(self, prefix=''):
+        """
+        Get the arrays to store, e.g. with numpy.savez.
+
+        Parameters:
+        - prefix (str): Prefix of the array names.
+
+        Returns:
+        dict: Arrays per name.
+        """
+        return {f'{prefix}landmarks': self.landmarks, f'{prefix}dist_from': self.dist_from,
+                f'{prefix}dist_to': self.dist_to}
+
+    def save(self, file, prefix=''):
+        """
+        Save the landmark distances to a .npz file.
+
+        Parameters:
+        - file (str): Path to the .npz file.
+        - prefix (str): Prefix of the arrays in the file.
+        """
+        np.savez(file, **self.to_dict(prefix))
+
+    @property
+    def n_nodes(self):
+        """Number of nodes of the graph the landmarks were built for."""
+        return len(self.dist_from)
+
+    def get_heuristic(self, targets):
+        """
+        Get the ALT heuristic towards targets.
+
+        Parameters:
+        - targets (dict): Extra cost to reach the destination per target node id.
+
+        Returns:
+        function: Lower bound on the cost from a node to the destination.
+        """
+        n_landmarks = len(self.landmarks)
+        dist_from = memoryview(self.dist_from.reshape(-1))
+        dist_to = memoryview(self.dist_to.reshape(-1))
+        target_bounds = [(self.dist_from[target].tolist(), self.dist_to[target].tolist(),
+                          extra - self.tolerance) for target, extra in targets.items()]
+        cache = {}
+
+        def heuristic(node):
+            if node in cache:
+                return cache[node]
+            offset = node * n_landmarks
+            node_from = dist_from[offset:offset + n_landmarks].tolist()
+            node_to = dist_to[offset:offset + n_landmarks].tolist()
+            # d(node, target) >= d(L, target) - d(L, node) and >= d(node, L) - d(target, L).
+            # A node that is unreachable from or cannot reach a landmark gets a bound that
+            # is either huge (the target cannot be reached) or negative (no information).
+            bound = min(max(0, *map(operator.sub, target_from, node_from),
+                            *map(operator.sub, node_to, target_to)) + extra
+                        for target_from, target_to, extra in target_bounds)
+            cache[node] = bound = max(bound, 0)
+            return bound
+        return heuristic
+
+
+def one_to_many(graph, source, targets, weight, max_curb_height=np.inf,
+                min_sidewalk_width=-np.inf, return_paths=False):
+    """
+    Get the shortest accessible paths from one source to many targets with a single search.
+
+    Parameters:
+    - graph (CSRGraph): Routing graph.
+    - source (int): Source node id.
+    - targets (list): Target node ids.
+    - weight (numpy.ndarray): Weight per edge id.
+    - max_curb_height (float): Edges with a higher curb height are skipped.
+    - min_sidewalk_width (float): Edges with a smaller obstacle free width are skipped.
+    - return_paths (bool): Whether to reconstruct the paths from the search tree.
+
+    Returns:
+    Tuple (costs, paths) with a NumPy array of costs per target (inf if unreachable) and a
+    list of edge ids per target (None if unreachable), or None if return_paths is False.
+    """
+    dist, pred, _ = search(graph, {source: 0.0}, weight, max_curb_height=max_curb_height,
+                           min_sidewalk_width=min_sidewalk_width, settle=targets)
+    costs = np.array([dist.get(target, np.inf) for target in targets], dtype=float)
+    paths = [get_path(pred, target)[1] for target in targets] if return_paths else None
+    return costs, paths
+
+
+# Arguments shared by the one-to-many searches of a process pool worker.
+_worker_args = None
+
+
+def _init_worker(*args):
+    global _worker_args
+    _worker_args = args
+
+
+def _one_to_many_worker(sources):
+    graph, targets, weight, max_curb_height, min_sidewalk_width, return_paths = _worker_args
+    return [one_to_many(graph, source, targets, weight, max_curb_height, min_sidewalk_width,
+                        return_paths) for source in sources]
+
+
+def many_to_many(graph, sources, targets, weight, max_curb_height=np.inf,
+                 min_sidewalk_width=-np.inf, return_paths=False, n_workers=None, chunk_size=16):
+    """
+    Get the shortest accessible path costs between many sources and many targets.
+
+    One search is run per unique source and its search tree is reused for all targets.
+    The searches are spread over a process pool.
+
+    Parameters:
+    - graph (CSRGraph): Routing graph.
+    - sources (array-like): Source node ids, negative ids are treated as unreachable.
+    - targets (array-like): Target node ids, negative ids are treated as unreachable.
+    - weight (numpy.ndarray): Weight per edge id.
+    - max_curb_height (float): Edges with a higher curb height are skipped.
+    - min_sidewalk_width (float): Edges with a smaller obstacle free width are skipped.
+    - return_paths (bool): Whether to reconstruct the paths.
+    - n_workers (int): Number of worker processes, None for the number of CPUs. If 1, the
+      searches run in the current process.
+    - chunk_size (int): Number of sources per task sent to a worker.
+
+    Returns:
+    Tuple (costs, paths) with a NumPy cost matrix of shape (n_sources, n_targets) (inf if
+    unreachable) and a nested list of edge ids per source and target, or None if
+    return_paths is False.
+    """
+    sources, targets = np.asarray(sources), np.asarray(targets)
+    target_idx = np.flatnonzero(targets >= 0)
+    unique_sources = np.unique(sources[sources >= 0]).tolist()
+    chunks = [unique_sources[i:i + chunk_size]
+              for i in range(0, len(unique_sources), chunk_size)]
+    args = (graph, targets[target_idx].tolist(), weight, max_curb_height, min_sidewalk_width,
+            return_paths)
+
+    if n_workers == 1:
+        _init_worker(*args)
+        results = [_one_to_many_worker(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=args) as executor:
+            results = list(executor.map(_one_to_many_worker, chunks))
+    results = dict(zip(unique_sources, (result for chunk in results for result in chunk)))
+
+    costs = np.full((len(sources), len(targets)), np.inf)
+    paths = [[None] * len(targets) for _ in sources] if return_paths else None
+    for i, source in enumerate(sources):
+        if source < 0:
+            continue
+        source_costs, source_paths = results[source]
+        costs[i, target_idx] = source_costs
+        if return_paths:
+            for j, path in zip(target_idx, source_paths):
+                paths[i][j] = path
+    return costs, paths
+
+
+class SnapIndex:
+    """
+    Spatial index to snap points to the nodes or edges of a CSR graph, built once per graph.
+
+    Nodes are indexed with a KD-tree and edges with an STRtree of their geometries.
+    """
+
+    def __init__(self, graph, geometries):
+        self.graph = graph
+        self.geometries = np.asarray(geometries)
+        self.node_tree = cKDTree(graph.node_coords)
+        self.edge_tree = shapely.STRtree(self.geometries)
+
+    def _has_accessible_arc(self, node, max_curb_height, min_sidewalk_width):
+        edges = self.graph.arc_edge[self.graph.indptr[node]:self.graph.indptr[node + 1]]
+        return get_accessible_mask(self.graph.edge_data['curb_height_max'][edges],
+                                   self.graph.edge_data['obstacle_free_width_float'][edges],
+                                   max_curb_height, min_sidewalk_width).any()
+
+    def nearest_nodes(self, points, max_dist=np.inf, max_curb_height=np.inf,
+                      min_sidewalk_width=-np.inf, k=16):
+        """
+        Get the nearest node with at least one accessible outgoing edge for each point.
+
+        Parameters:
+        - points (numpy.ndarray): Point coordinates of shape (n, 2).
+        - max_dist (float): Maximum distance between a point and its node.
+        - max_curb_height (float): Maximum curb height (in meters).
+        - min_sidewalk_width (float): Minimum sidewalk width (in meters).
+        - k (int): Number of nearest nodes to consider per point.
+
+        Returns:
+        Tuple of NumPy arrays (node ids, distances). The node id is -1 and the distance inf
+        if no accessible node is found within max_dist.
+        """
+        points = np.atleast_2d(points)
+        k = min(k, self.graph.n_nodes)
+        dists, nodes = self.node_tree.query(points, k=k, distance_upper_bound=max_dist)
+        dists, nodes = dists.reshape(len(points), k), nodes.reshape(len(points), k)
+        snapped_nodes = np.full(len(points), -1)
+        snapped_dists = np.full(len(points), np.inf)
+        for i in range(len(points)):
+            for dist, node in zip(dists[i], nodes[i]):
+                if np.isinf(dist):
+                    break
+                if self._has_accessible_arc(node, max_curb_height, min_sidewalk_width):
+                    snapped_nodes[i], snapped_dists[i] = node, dist
+                    break
+        return snapped_nodes, snapped_dists
+
+    def nearest_edges(self, points, max_dist, max_curb_height=np.inf,
+                      min_sidewalk_width=-np.inf):
+        """
+        Get the nearest accessible edge and the split point on that edge for each point.
+
+        Parameters:
+        - points (numpy.ndarray): Point coordinates of shape (n, 2).
+        - max_dist (float): Maximum distance between a point and its edge.
+        - max_curb_height (float): Maximum curb height (in meters).
+        - min_sidewalk_width (float): Minimum sidewalk width (in meters).
+
+        Returns:
+        Tuple of NumPy arrays (edge ids, distances, positions, split points). The position
+        is the distance along the edge geometry to the split point. The edge id is -1 and
+        the distance inf if no accessible edge is found within max_dist.
+        """
+        points = shapely.points(np.atleast_2d(points))
+        point_idx, edge_idx = self.edge_tree.query(points, predicate='dwithin',
+                                                   distance=max_dist)
+        mask = get_accessible_mask(self.graph.edge_data['curb_height_max'][edge_idx],
+                                   self.graph.edge_data['obstacle_free_width_float'][edge_idx],
+                                   max_curb_height, min_sidewalk_width)
+        point_idx, edge_idx = point_idx[mask], edge_idx[mask]
+        dists = shapely.distance(points[point_idx], self.geometries[edge_idx])
+
+        # Keep the closest edge per point.
+        order = np.lexsort((dists, point_idx))
+        point_idx, first = np.unique(point_idx[order], return_index=True)
+        edge_idx, dists = edge_idx[order][first], dists[order][first]
+
+        snapped_edges = np.full(len(points), -1)
+        snapped_dists = np.full(len(points), np.inf)
+        positions = np.full(len(points), np.nan)
+        split_points = np.full((len(points), 2), np.nan)
+        snapped_edges[point_idx], snapped_dists[point_idx] = edge_idx, dists
+        positions[point_idx] = shapely.line_locate_point(self.geometries[edge_idx],
+                                                         points[point_idx])
+        split_points[point_idx] = shapely.get_coordinates(shapely.line_interpolate_point(
+            self.geometries[edge_idx], positions[point_idx]))
+        return snapped_edges, snapped_dists, positions, split_points
@@ -1,3 +1,5 @@
+import os
+
 import laspy
 import numpy as np
 
@@ -25,3 +27,237 @@ def read_las(las_path):
     points = np.vstack((x, y, z)).T
 
     return points, labels
+
+
+def get_bbox_mask(points, bbox):
+    """
+    Get a mask of the points inside a bounding box.
+
+    Parameters:
+    - points (numpy.ndarray): Array of points.
+    - bbox (tuple): Bounding box (x_min, y_min, x_max, y_max), as given by shapely bounds.
+
+    Returns:
+    numpy.ndarray: Boolean mask for points.
+    """
+    x_min, y_min, x_max, y_max = bbox
+    return ((points[:, 0] >= x_min) & (points[:, 0] <= x_max)
+            & (points[:, 1] >= y_min) & (points[:, 1] <= y_max))
+
+
+def read_las_chunked(las_path, bbox=None, chunk_size=1_000_000):
+    """
+    Read a LAS file in chunks and keep only the points inside a bounding box.
+
+    Only one chunk of the full point cloud is decompressed in memory at a time.
+
+    Parameters:
+    - las_path (str): Path to the LAS file.
+    - bbox (tuple): Bounding box (x_min, y_min, x_max, y_max). If None, all points are kept.
+    - chunk_size (int): Number of points to read at once.
+
+    Returns:
+    Tuple of NumPy arrays (points, labels).
+    """
+    all_points, all_labels = [], []
+    with laspy.open(las_path) as reader:
+        has_labels = 'label' in reader.header.point_format.extra_dimension_names
+        for chunk in reader.chunk_iterator(chunk_size):
+            points = np.column_stack((chunk.x, chunk.y, chunk.z))
+            if has_labels:
+                labels = np.asarray(chunk.label, dtype='uint16')
+            else:
+                labels = np.zeros((len(points),), dtype='uint16')
+            if bbox is not None:
+                mask = get_bbox_mask(points, bbox)
+                points, labels = points[mask], labels[mask]
+            all_points.append(points)
+            all_labels.append(labels)
+
+    if not all_points:
+        return np.empty((0, 3)), np.empty((0,), dtype='uint16')
+    return np.concatenate(all_points), np.concatenate(all_labels)
+
+
+def get_cells(x, y, origin, cell_size, shape):
+    """
+    Get the index of the grid cell of each point, numbered per column of cells.
+
+    Parameters:
+    - x (numpy.ndarray): X coordinates of the points.
+    - y (numpy.ndarray): Y coordinates of the points.
+    - origin (tuple): Lower left corner (x_min, y_min) of the grid.
+    - cell_size (float): Size of the grid cells (in meters).
+    - shape (tuple): Number of columns and rows (n_cols, n_rows) of the grid.
+
+    Returns:
+    numpy.ndarray: Cell index col * n_rows + row of each point.
+    """
+    n_cols, n_rows = shape
+    col = np.clip(((x - origin[0]) // cell_size).astype(int), 0, n_cols - 1)
+    row = np.clip(((y - origin[1]) // cell_size).astype(int), 0, n_rows - 1)
+    return col * n_rows + row
+
+
+def cache_las(las_path, cache_folder, cell_size=5, chunk_size=1_000_000):
+    """
+    Decompress a LAS file once to memory-mapped NumPy files, sorted in grid cells.
+
+    Points are sorted per column of grid cells and per cell within a column, so the points of
+    a range of cells in one column are a contiguous slice of the cache. The points are counted
+    per cell first and then written to their cell chunk by chunk, so the memory use depends on
+    the chunk size and the number of cells, not on the number of points.
+
+    Parameters:
+    - las_path (str): Path to the LAS file.
+    - cache_folder (str): Folder to store the cache in, a subfolder per LAS file is created.
+    - cell_size (float): Size of the grid cells (in meters).
+    - chunk_size (int): Number of points to read and write at once.
+
+    Returns:
+    str: Path to the cache of the LAS file.
+    """
+    cache_path = get_cache_path(las_path, cache_folder)
+    os.makedirs(cache_path, exist_ok=True)
+
+    with laspy.open(las_path) as reader:
+        n_points = reader.header.point_count
+        origin = reader.header.mins[:2]
+        x_max, y_max = reader.header.maxs[:2]
+        has_labels = 'label' in reader.header.point_format.extra_dimension_names
+        shape = (int((x_max - origin[0]) // cell_size) + 1,
+                 int((y_max - origin[1]) // cell_size) + 1)
+        n_cells = shape[0] * shape[1]
+
+        # Decompress all chunks to a temporary unsorted file and count the points per cell.
+        unsorted_file = os.path.join(cache_path, 'unsorted.npy')
+        unsorted = np.lib.format.open_memmap(unsorted_file, mode='w+', dtype='float64',
+                                             shape=(n_points, 4))
+        cell_counts = np.zeros(n_cells, dtype='int64')
+        start = 0
+        for chunk in reader.chunk_iterator(chunk_size):
+            end = start + len(chunk)
+            unsorted[start:end, 0] = chunk.x
+            unsorted[start:end, 1] = chunk.y
+            unsorted[start:end, 2] = chunk.z
+            unsorted[start:end, 3] = chunk.label if has_labels else 0
+            cell = get_cells(unsorted[start:end, 0], unsorted[start:end, 1], origin, cell_size,
+                             shape)
+            cell_counts += np.bincount(cell, minlength=n_cells)
+            start = end
+
+    # Write each chunk to the next free positions of its cells, keeping the point order.
+    cell_offsets = np.concatenate([[0], np.cumsum(cell_counts)])
+    next_free = cell_offsets[:-1].copy()
+    points = np.lib.format.open_memmap(os.path.join(cache_path, 'points.npy'), mode='w+',
+                                       dtype='float64', shape=(n_points, 3))
+    labels = np.lib.format.open_memmap(os.path.join(cache_path, 'labels.npy'), mode='w+',
+                                       dtype='uint16', shape=(n_points,))
+    for i in range(0, n_points, chunk_size):
+        chunk = np.asarray(unsorted[i:i + chunk_size])
+        cell = get_cells(chunk[:, 0], chunk[:, 1], origin, cell_size, shape)
+        order = np.argsort(cell, kind='stable')
+        cell = cell[order]
+        chunk_counts = np.bincount(cell, minlength=n_cells)
+        rank = np.arange(len(cell)) - (np.cumsum(chunk_counts) - chunk_counts)[cell]
+        position = next_free[cell] + rank
+        points[position] = chunk[order, :3]
+        labels[position] = chunk[order, 3]
+        next_free += chunk_counts
+    points.flush()
+    labels.flush()
+    del unsorted, points, labels
+    os.remove(unsorted_file)
+
+    np.savez(os.path.join(cache_path, 'cells.npz'), origin=np.asarray(origin),
+             cell_size=cell_size, shape=np.array(shape), offsets=cell_offsets)
+    return cache_path
+
+
+def get_cache_path(las_path, cache_folder):
+    """
+    Get the path to the memory-mapped cache of a LAS file.
+
+    Parameters:
+    - las_path (str): Path to the LAS file.
+    - cache_folder (str): Folder with the caches.
+
+    Returns:
+    str: Path to the cache of the LAS file.
+    """
+    return os.path.join(cache_folder, os.path.splitext(os.path.basename(las_path))[0])
+
+
+def read_las_cache(cache_path, bbox=None):
+    """
+    Read the points inside a bounding box from a memory-mapped LAS cache.
+
+    Only the grid cells overlapping the bounding box are read from disk. The returned arrays
+    are read-only views on the memory-mapped cache (without copying) only if bbox is None, or
+    if the overlapping cells lie in a single column of cells and all of their points are inside
+    the bounding box. In all other cases, e.g. a bounding box spanning several columns of
+    cells, the points inside the bounding box are copied into new arrays.
+
+    Parameters:
+    - cache_path (str): Path to the cache, as created by cache_las.
+    - bbox (tuple): Bounding box (x_min, y_min, x_max, y_max). If None, all points are returned.
+
+    Returns:
+    Tuple of NumPy arrays (points, labels).
+    """
+    points = np.load(os.path.join(cache_path, 'points.npy'), mmap_mode='r')
+    labels = np.load(os.path.join(cache_path, 'labels.npy'), mmap_mode='r')
+    if bbox is None:
+        return points, labels
+
+    cells = np.load(os.path.join(cache_path, 'cells.npz'))
+    (x_origin, y_origin), cell_size = cells['origin'], cells['cell_size']
+    n_cols, n_rows = cells['shape']
+    offsets = cells['offsets']
+    x_min, y_min, x_max, y_max = bbox
+    if x_max < x_origin or y_max < y_origin:
+        return points[:0], labels[:0]
+    col_min, col_max = np.clip(((np.array([x_min, x_max]) - x_origin) // cell_size).astype(int),
+                               0, n_cols - 1)
+    row_min, row_max = np.clip(((np.array([y_min, y_max]) - y_origin) // cell_size).astype(int),
+                               0, n_rows - 1)
+
+    # One contiguous slice per column of cells.
+    cols = np.arange(col_min, col_max + 1)
+    starts = offsets[cols * n_rows + row_min]
+    ends = offsets[cols * n_rows + row_max + 1]
+    slices = [slice(start, end) for start, end in zip(starts, ends) if end > start]
+    if len(slices) == 1:
+        points_in_cells, labels_in_cells = points[slices[0]], labels[slices[0]]
+        mask = get_bbox_mask(points_in_cells, bbox)
+        if mask.all():
+            return points_in_cells, labels_in_cells
+    else:
+        points_in_cells = np.concatenate([points[s] for s in slices] or [points[:0]])
+        labels_in_cells = np.concatenate([labels[s] for s in slices] or [labels[:0]])
+        mask = get_bbox_mask(points_in_cells, bbox)
+    return points_in_cells[mask], labels_in_cells[mask]
+
+
+def read_las_bbox(las_path, bbox, cache_folder=None, chunk_size=1_000_000):
+    """
+    Read the points inside a bounding box from a LAS file.
+
+    With a cache folder, the LAS file is decompressed to a memory-mapped cache on first use
+    and read from the cache afterwards. Otherwise the LAS file is streamed in chunks.
+
+    Parameters:
+    - las_path (str): Path to the LAS file.
+    - bbox (tuple): Bounding box (x_min, y_min, x_max, y_max).
+    - cache_folder (str): Folder for memory-mapped caches, or None to not cache.
+    - chunk_size (int): Number of points to read at once.
+
+    Returns:
+    Tuple of NumPy arrays (points, labels).
+    """
+    if cache_folder is None:
+        return read_las_chunked(las_path, bbox, chunk_size)
+    cache_path = get_cache_path(las_path, cache_folder)
+    if not os.path.exists(os.path.join(cache_path, 'cells.npz')):
+        cache_las(las_path, cache_folder, chunk_size=chunk_size)
+    return read_las_cache(cache_path, bbox)
@@ -1,6 +1,8 @@
 import sys
 sys.path.append('../notebooks')
+from concurrent.futures import ProcessPoolExecutor
 
+import shapely
 import shapely.geometry as sg
 import shapely.ops as so
 from centerline.geometry import Centerline
@@ -9,6 +11,8 @@ import pandas as pd
 import geopandas as gpd
 from geopandas import GeoDataFrame
 from shapely.geometry import Polygon
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from scipy.spatial import cKDTree
 import settings as st
 
@@ -70,32 +74,63 @@ def get_centerlines(polygon, interpolation_distance=0.5):
     return x
 
 
-def remove_short_lines(line, min_se_length=5):
+def get_dead_ends(lines):
+    """
+    Flag lines with an end point that does not touch any of the other lines.
+
+    End points are first matched to the end points of other lines by their coordinates,
+    only the remaining end points are checked against the other lines with a spatial index.
+
+    Parameters:
+    - lines (list of shapely.geometry.LineString): Input LineStrings.
+
+    Returns:
+    numpy.ndarray: Boolean mask of the dead end lines.
+    """
+    lines = gpd.GeoSeries(list(lines))
+    if len(lines) == 0:
+        return np.zeros(0, dtype=bool)
+    _, edge_nodes = get_line_end_nodes(lines.values)
+    degree = np.bincount(edge_nodes.ravel())
+    own_ends = 1 + (edge_nodes[:, 0] == edge_nodes[:, 1])
+    free_end = (degree[edge_nodes] - own_ends[:, None]) == 0
+
+    # An end point can also touch another line between its end points.
+    line_idx, end_idx = np.nonzero(free_end)
+    if len(line_idx):
+        start, end = get_line_ends(lines.values)
+        points = gpd.points_from_xy(*np.where(end_idx[:, None] == 0, start[line_idx],
+                                              end[line_idx]).T)
+        point_idx, other_idx = lines.sindex.query(points, predicate='intersects')
+        touches = point_idx[other_idx != line_idx[point_idx]]
+        free_end[line_idx[touches], end_idx[touches]] = False
+    return free_end.any(axis=1)
+
+
+def remove_short_lines(line, min_se_length=5, iterative=False):
     """
     Remove short lines from a MultiLineString.
 
     Parameters:
     - line (shapely.geometry.MultiLineString): Input MultiLineString.
     - min_se_length (float): Minimum length for a line to be retained.
+    - iterative (bool): Whether to keep removing short dead ends created by the removal of
+      other lines, until no more lines are removed.
 
     Returns:
     shapely.geometry.MultiLineString: MultiLineString with short lines removed.
     """
-    if line.type == 'MultiLineString':
-        passing_lines = []
-        for i, linestring in enumerate(line.geoms):
-            other_lines = sg.MultiLineString([x for j, x in enumerate(line.geoms) if j != i])
-            p0 = sg.Point(linestring.coords[0])
-            p1 = sg.Point(linestring.coords[-1])
-            is_deadend = False
-            if p0.disjoint(other_lines):
-                is_deadend = True
-            if p1.disjoint(other_lines):
-                is_deadend = True
-            if not is_deadend or linestring.length > min_se_length:
-                passing_lines.append(linestring)
+    if line.geom_type == 'MultiLineString':
+        passing_lines = list(line.geoms)
+        while passing_lines:
+            is_short = np.array([linestring.length <= min_se_length
+                                 for linestring in passing_lines], dtype=bool)
+            remove = is_short & get_dead_ends(passing_lines)
+            passing_lines = [x for x, r in zip(passing_lines, remove) if not r]
+            if not iterative or not remove.any():
+                break
         return sg.MultiLineString(passing_lines)
-    if line.type == 'LineString':
+    if line.geom_type == 'LineString':
         return line
 
 
@@ -240,6 +275,126 @@ def get_avg_width_cl(poly, segments, resolution=1, precision=2):
     return pd.Series([np.round(avg_width, precision), np.round(min_width, precision)])
 
 
+def get_polygon_boundary_segments(polygon):
+    """
+    Get the boundary segments of a Polygon or MultiPolygon as start and end coordinates.
+
+    Parameters:
+    - polygon (shapely.geometry.Polygon or shapely.geometry.MultiPolygon): Input polygon.
+
+    Returns:
+    Tuple (numpy.ndarray, numpy.ndarray): Start and end coordinates of the segments.
+    """
+    polygons = polygon.geoms if polygon.geom_type == 'MultiPolygon' else [polygon]
+    rings = [np.asarray(ring.coords)[:, :2] for poly in polygons
+             for ring in [poly.exterior, *poly.interiors]]
+    return (np.concatenate([ring[:-1] for ring in rings]),
+            np.concatenate([ring[1:] for ring in rings]))
+
+
+def get_segment_distances(points, segment_start, segment_end, piece_length=1):
+    """
+    Calculate the distance from each point to the nearest of a set of line segments.
+
+    The segments are split into pieces of at most piece_length and indexed by their midpoints
+    in a KD-tree. The nearest piece always has its midpoint within half a piece length of the
+    distance to the nearest midpoint, so only the pieces within that radius are evaluated.
+
+    Parameters:
+    - points (numpy.ndarray): Point coordinates of shape (n, 2).
+    - segment_start (numpy.ndarray): Start coordinates of the segments.
+    - segment_end (numpy.ndarray): End coordinates of the segments.
+    - piece_length (float): Maximum length of the pieces the segments are split into.
+
+    Returns:
+    numpy.ndarray: Distance from each point to the nearest segment.
+    """
+    if len(points) == 0:
+        return np.empty(0)
+    direction = segment_end - segment_start
+    n_pieces = np.maximum(np.ceil(np.hypot(*direction.T) / piece_length), 1).astype(int)
+    segment = np.repeat(np.arange(len(direction)), n_pieces)
+    piece_number = np.arange(len(segment)) - np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces)
+    piece_direction = direction[segment] / n_pieces[segment, None]
+    piece_start = segment_start[segment] + piece_number[:, None] * piece_direction
+    tree = cKDTree(piece_start + piece_direction / 2)
+
+    nearest_midpoint, _ = tree.query(points)
+    radius = nearest_midpoint + np.hypot(*piece_direction.T).max() / 2
+    candidates = tree.query_ball_point(points, radius * (1 + 1e-9) + 1e-9)
+    count = np.fromiter(map(len, candidates), dtype=int, count=len(points))
+    piece = np.concatenate(candidates).astype(int)
+
+    # Distance from each point to its candidate pieces.
+    offset = points[np.repeat(np.arange(len(points)), count)] - piece_start[piece]
+    piece_direction = piece_direction[piece]
+    length_sq = np.einsum('ij,ij->i', piece_direction, piece_direction)
+    t = np.divide(np.einsum('ij,ij->i', offset, piece_direction), length_sq,
+                  out=np.zeros(len(piece)), where=length_sq > 0)
+    offset -= np.clip(t, 0, 1)[:, None] * piece_direction
+    return np.minimum.reduceat(np.hypot(*offset.T), np.cumsum(count) - count)
+
+
+def get_avg_width_batch(polygons, centerlines, sidewalk_ids=None, resolution=1, precision=2):
+    """
+    Calculate average and minimum widths for many centerlines at once.
+
+    Gives the same result as get_avg_width_cl applied per row: points are interpolated on all
+    centerlines at once and the distance to the sidewalk boundary is calculated per sidewalk,
+    so each sidewalk polygon is processed only once.
+
+    Parameters:
+    - polygons (array-like of shapely.geometry.Polygon): Sidewalk polygon for each centerline.
+    - centerlines (array-like of shapely.geometry.LineString or
+      shapely.geometry.MultiLineString): Centerlines within the sidewalk polygons.
+    - sidewalk_ids (array-like): Sidewalk id of each centerline, rows with the same id share
+      the same polygon. If None, each row is treated as a separate sidewalk.
+    - resolution (float): Interpolation resolution.
+    - precision (int): Number of decimal places for the result.
+
+    Returns:
+    Tuple (numpy.ndarray, numpy.ndarray): Arrays of average and minimum widths.
+    """
+    polygons = to_geometry_array(polygons)
+    centerlines = to_geometry_array(centerlines)
+    if sidewalk_ids is None:
+        sidewalk_ids = np.arange(len(polygons))
+    _, first_row, sidewalk_index = np.unique(np.asarray(sidewalk_ids), return_index=True,
+                                             return_inverse=True)
+
+    # Interpolate points on all parts of all centerlines, as interpolate_by_distance does.
+    parts = [(i, part) for i, line in enumerate(centerlines)
+             for part in getattr(line, 'geoms', [line])]
+    part_row = np.array([i for i, _ in parts], dtype=int)
+    coords, vertex_part, measure, part_start = get_line_measures([part for _, part in parts])
+    part_length = np.array([part.length for _, part in parts])
+    count = np.round(part_length / resolution).astype(int) + 1
+    point_part = np.repeat(np.arange(len(parts)), count)
+    point_number = np.arange(len(point_part)) - np.repeat(np.cumsum(count) - count, count)
+    distance = np.where(count[point_part] == 1, part_length[point_part] / 2,
+                        np.minimum(point_number * resolution, part_length[point_part]))
+    points = interpolate_measures(coords, vertex_part, measure, point_part,
+                                  part_start[point_part] + distance)
+
+    # Distance to the sidewalk boundary, one sidewalk at a time.
+    point_row = part_row[point_part]
+    point_sidewalk = sidewalk_index[point_row]
+    order = np.argsort(point_sidewalk, kind='stable')
+    bounds = np.searchsorted(point_sidewalk[order], np.arange(len(first_row) + 1))
+    distances = np.empty(len(points))
+    for k, row in enumerate(first_row):
+        if bounds[k] < bounds[k + 1]:
+            idx = order[bounds[k]:bounds[k + 1]]
+            distances[idx] = get_segment_distances(
+                points[idx], *get_polygon_boundary_segments(polygons[row]))
+
+    # Points are ordered by row, aggregate per row.
+    row_start = np.searchsorted(point_row, np.arange(len(centerlines)))
+    avg_width = np.add.reduceat(distances, row_start) / np.diff(np.r_[row_start, len(points)]) * 2
+    min_width = np.minimum.reduceat(distances, row_start) * 2
+    return np.round(avg_width, precision), np.round(min_width, precision)
+
+
 def get_route_width(route_weight):
     """
     Map route weight to corresponding route width.
@@ -275,6 +430,234 @@ def get_route_width(route_weight):
     return route_width
 
 
+def get_line_ends(lines):
+    """
+    Get the start and end point of many LineStrings.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+
+    Returns:
+    Tuple of NumPy arrays (start, end) with the coordinates of the start and end points.
+    """
+    coords, line_index = get_lines_coords(lines)
+    first = np.searchsorted(line_index, np.arange(len(lines)))
+    last = np.searchsorted(line_index, np.arange(len(lines)), side='right') - 1
+    return coords[first], coords[last]
+
+
+def get_line_end_nodes(lines):
+    """
+    Number the end points of many LineStrings, equal end points get the same node.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+
+    Returns:
+    Tuple of NumPy arrays (node_coords, edge_nodes) with the coordinates of the nodes and the
+    start and end node of each line, of shape (n, 2).
+    """
+    start, end = get_line_ends(lines)
+    node_coords, edge_nodes = np.unique(np.concatenate([start, end]), axis=0,
+                                        return_inverse=True)
+    return node_coords, edge_nodes.reshape(2, -1).T
+
+
+def get_bottleneck_widths(edge_nodes, edge_widths, origins, destinations):
+    """
+    Get the width of the widest path between pairs of nodes in a graph.
+
+    The width of a path is the smallest width of its edges. Edges are added from wide to
+    narrow and all pairs are checked for a connection once per distinct width, so this is
+    meant for widths in a few classes.
+
+    Parameters:
+    - edge_nodes (numpy.ndarray): Nodes of each edge, of shape (n, 2), numbered from 0.
+    - edge_widths (numpy.ndarray): Width of each edge, NaN if unknown. Unknown widths are
+      narrower than any known width.
+    - origins (numpy.ndarray): Origin node of each pair.
+    - destinations (numpy.ndarray): Destination node of each pair.
+
+    Returns:
+    numpy.ndarray: Width of the widest path for each pair, NaN if it has an edge of unknown
+    width, -inf if there is no path and inf if origin and destination are the same node.
+    """
+    origins, destinations = np.asarray(origins, dtype=int), np.asarray(destinations, dtype=int)
+    edge_nodes = np.asarray(edge_nodes, dtype=int).reshape(-1, 2)
+    edge_widths = np.asarray(edge_widths, dtype=float)
+    n_nodes = max(edge_nodes.max(initial=-1), origins.max(initial=-1),
+                  destinations.max(initial=-1)) + 1
+
+    widths = np.full(len(origins), -np.inf)
+    widths[origins == destinations] = np.inf
+    todo = origins != destinations
+    known = ~np.isnan(edge_widths)
+    for level in [*np.unique(edge_widths[known])[::-1], np.nan]:
+        if not todo.any():
+            break
+        use = known & (edge_widths >= level) if not np.isnan(level) else np.ones_like(known)
+        graph = coo_matrix((np.ones(use.sum()), (edge_nodes[use, 0], edge_nodes[use, 1])),
+                           shape=(n_nodes, n_nodes))
+        _, labels = connected_components(graph, directed=False)
+        connected = todo & (labels[origins] == labels[destinations])
+        widths[connected] = level
+        todo &= ~connected
+    return widths
+
+
+def get_route_widths(segments, segment_widths, centerlines, max_dist=st.max_dist):
+    """
+    Get the obstacle-free width of the widest route between the start and end of centerlines.
+
+    Routes go over the network of segments within one sidewalk. The start and end of each
+    centerline are snapped to the nearest segment end point.
+
+    Parameters:
+    - segments (array-like of shapely.geometry.LineString): Segments within the sidewalk.
+    - segment_widths (numpy.ndarray): Width class of each segment, NaN if unknown.
+    - centerlines (array-like of shapely.geometry.LineString): Centerlines of the sidewalk.
+    - max_dist (float): Maximum distance between a centerline end and the nearest node.
+
+    Returns:
+    numpy.ndarray: Obstacle-free width of each centerline. NaN for rings, for start or end
+    points too far from the network and for routes over segments of unknown width, 0 if no
+    route is found.
+    """
+    route_widths = np.full(len(centerlines), np.nan)
+    if len(segments) == 0 or len(centerlines) == 0:
+        return route_widths
+
+    node_coords, edge_nodes = get_line_end_nodes(segments)
+
+    # Snap start and end of the centerlines to the nearest node.
+    cl_start, cl_end = get_line_ends(centerlines)
+    is_ring = np.all(cl_start == cl_end, axis=1)
+    tree = cKDTree(node_coords)
+    origin_dist, origins = tree.query(cl_start)
+    dest_dist, destinations = tree.query(cl_end)
+
+    widths = get_bottleneck_widths(edge_nodes, segment_widths, origins, destinations)
+    too_far = (origin_dist >= max_dist) | (dest_dist >= max_dist)
+    route_widths = np.where(np.isneginf(widths), 0, widths)
+    route_widths[np.isposinf(widths) | (too_far & ~np.isneginf(widths)) | is_ring] = np.nan
+    return route_widths
+
+
+def fill_unknown_widths(lines, widths, width_fill, min_width=st.min_path_width):
+    """
+    Fill unknown widths with the minimum width of the neighboring lines.
+
+    Lines are neighbors if they share an end point. Filled widths are used for the
+    neighbors of the next iteration, until no more widths can be filled.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+    - widths (numpy.ndarray): Width of each line, NaN if unknown.
+    - width_fill (numpy.ndarray): Code of adjustments made to the width of each line.
+    - min_width (float): Width of lines without neighbors with a known width.
+
+    Returns:
+    Tuple of NumPy arrays (widths, width_fill). Filled widths get code 2 if taken from
+    neighbors and code 3 if set to min_width.
+    """
+    widths = np.array(widths, dtype=float)
+    width_fill = np.array(width_fill)
+    if len(widths) == 0:
+        return widths, width_fill
+
+    # Pairs of lines that share a node, from the incidence matrix of lines and nodes.
+    _, edge_nodes = get_line_end_nodes(lines)
+    n_lines, n_nodes = len(edge_nodes), edge_nodes.max() + 1
+    incidence = coo_matrix((np.ones(2 * n_lines), (np.tile(np.arange(n_lines), 2),
+                                                   edge_nodes.T.ravel())),
+                           shape=(n_lines, n_nodes)).tocsr()
+    line, neighbor = (incidence @ incidence.T).nonzero()
+    line, neighbor = line[line != neighbor], neighbor[line != neighbor]
+
+    while True:
+        unknown = np.isnan(widths)
+        pairs = unknown[line] & ~unknown[neighbor]
+        if not pairs.any():
+            break
+        neighbor_min = pd.Series(widths[neighbor[pairs]]).groupby(line[pairs]).min()
+        widths[neighbor_min.index.values] = neighbor_min.values
+        width_fill[neighbor_min.index.values] = 2
+
+    unknown = np.isnan(widths)
+    widths[unknown] = min_width
+    width_fill[unknown] = 3
+    return widths, width_fill
+
+
+_worker_args = None
+
+
+def _init_worker(*args):
+    global _worker_args
+    _worker_args = args
+
+
+def _route_widths_worker(sidewalk):
+    segments, segment_widths, centerlines = sidewalk
+    max_dist, = _worker_args
+    return get_route_widths(segments, segment_widths, centerlines, max_dist)
+
+
+def get_obstacle_free_widths(centerline_df, sidewalk_df, segments_df, width_column='width_class',
+                             max_dist=st.max_dist, n_workers=None, chunk_size=64):
+    """
+    Get the obstacle-free width of all centerlines, in parallel per sidewalk.
+
+    Segments are assigned to the sidewalk polygons they are within with one spatial join,
+    after which get_route_widths is applied to the segments and centerlines of each sidewalk.
+
+    Parameters:
+    - centerline_df (DataFrame): Centerlines in the 'geometry' column with a 'sidewalk_id'
+      column. The active geometry column is not used, so it may hold the sidewalk polygons.
+    - sidewalk_df (GeoDataFrame): Sidewalk polygons with a 'sidewalk_id' column.
+    - segments_df (GeoDataFrame): Segments with their width class.
+    - width_column (str): Column of segments_df with the width class, NaN if unknown.
+    - max_dist (float): Maximum distance between a centerline end and the nearest node.
+    - n_workers (int): Number of worker processes, None for the number of processors and 1 to
+      run in the current process.
+    - chunk_size (int): Number of sidewalks sent to a worker at once.
+
+    Returns:
+    numpy.ndarray: Obstacle-free width of each centerline, NaN for centerlines without
+    sidewalk or without segments in their sidewalk.
+    """
+    segment_idx, sidewalk_idx = sidewalk_df.sindex.query(segments_df.geometry.values,
+                                                         predicate='within')
+    segment_groups = pd.Series(segment_idx).groupby(
+        sidewalk_df['sidewalk_id'].values[sidewalk_idx]).indices
+    centerline_groups = pd.Series(np.arange(len(centerline_df))).groupby(
+        centerline_df['sidewalk_id'].values).indices
+
+    segments = segments_df.geometry.values
+    segment_widths = segments_df[width_column].values.astype(float)
+    centerlines = centerline_df['geometry'].values
+    sidewalk_ids = [sidewalk_id for sidewalk_id in pd.unique(sidewalk_df['sidewalk_id'])
+                    if sidewalk_id in centerline_groups]
+    sidewalks = []
+    for sidewalk_id in sidewalk_ids:
+        sidewalk_segments = segment_idx[segment_groups.get(sidewalk_id, [])]
+        sidewalks.append((segments[sidewalk_segments], segment_widths[sidewalk_segments],
+                          centerlines[centerline_groups[sidewalk_id]]))
+
+    if n_workers == 1:
+        _init_worker(max_dist)
+        results = [_route_widths_worker(sidewalk) for sidewalk in sidewalks]
+    else:
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker,
+                                 initargs=(max_dist,)) as executor:
+            results = list(executor.map(_route_widths_worker, sidewalks, chunksize=chunk_size))
+
+    route_widths = np.full(len(centerline_df), np.nan)
+    for sidewalk_id, sidewalk_widths in zip(sidewalk_ids, results):
+        route_widths[centerline_groups[sidewalk_id]] = sidewalk_widths
+    return route_widths
+
+
 def create_df_centerlines(centerline):
     """
     Create a GeoDataFrame from centerline geometry.
@@ -323,27 +706,180 @@ def cut(line, distance):
             return [line_1, line_2]
 
 
+def to_geometry_array(geometries):
+    """
+    Convert geometries to a 1D NumPy object array.
+
+    np.asarray cannot be used, as it unpacks LineStrings with the same number of vertices
+    into a coordinate array with shapely 1.8.
+
+    Parameters:
+    - geometries (array-like of shapely.geometry.BaseGeometry): Input geometries.
+
+    Returns:
+    numpy.ndarray: Object array with one geometry per element.
+    """
+    geometries = list(geometries)
+    array = np.empty(len(geometries), dtype=object)
+    array[:] = geometries
+    return array
+
+
+def get_lines_coords(lines):
+    """
+    Get the 2D coordinates of many LineStrings as one array.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+
+    Returns:
+    Tuple of NumPy arrays (coords, line_index) with the vertices of all lines and the
+    index of the line each vertex belongs to.
+    """
+    lines = to_geometry_array(lines)
+    if hasattr(shapely, 'get_coordinates'):
+        return shapely.get_coordinates(lines, return_index=True)
+    coords = [np.asarray(line.coords)[:, :2] for line in lines]
+    line_index = np.repeat(np.arange(len(lines)), [len(c) for c in coords])
+    return np.concatenate(coords).reshape(-1, 2), line_index
+
+
+def create_linestrings(coords, line_index):
+    """
+    Create LineStrings from coordinates grouped by a sorted line index.
+
+    Parameters:
+    - coords (numpy.ndarray): Vertices of shape (n, 2).
+    - line_index (numpy.ndarray): Sorted index of the line each vertex belongs to.
+
+    Returns:
+    numpy.ndarray of shapely.geometry.LineString: One LineString per unique line index.
+    """
+    if hasattr(shapely, 'linestrings'):
+        return shapely.linestrings(coords, indices=line_index)
+    starts = np.flatnonzero(np.r_[True, line_index[1:] != line_index[:-1]])
+    lines = np.empty(len(starts), dtype=object)
+    lines[:] = [sg.LineString(c) for c in np.split(coords, starts[1:])]
+    return lines
+
+
+def get_line_measures(lines):
+    """
+    Get the vertices of many LineStrings with their cumulative distance along the lines.
+
+    The distance continues from one line to the next, so it is increasing over all vertices.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+
+    Returns:
+    Tuple of NumPy arrays (coords, line_index, measure, line_start) with the vertices, the
+    index of the line each vertex belongs to, the cumulative distance of each vertex and the
+    cumulative distance at the start of each line.
+    """
+    coords, line_index = get_lines_coords(lines)
+    segment_lengths = np.hypot(*np.diff(coords, axis=0).T)
+    segment_lengths[line_index[1:] != line_index[:-1]] = 0
+    measure = np.concatenate([[0], np.cumsum(segment_lengths)])
+    line_start = measure[np.minimum(np.searchsorted(line_index, np.arange(len(lines))),
+                                    len(measure) - 1)]
+    return coords, line_index, measure, line_start
+
+
+def interpolate_measures(coords, line_index, measure, point_line_index, point_measure):
+    """
+    Interpolate points on many LineStrings at cumulative distances from get_line_measures.
+
+    Parameters:
+    - coords (numpy.ndarray): Vertices of the lines.
+    - line_index (numpy.ndarray): Index of the line each vertex belongs to.
+    - measure (numpy.ndarray): Cumulative distance of each vertex.
+    - point_line_index (numpy.ndarray): Index of the line to interpolate each point on.
+    - point_measure (numpy.ndarray): Cumulative distance of each point.
+
+    Returns:
+    numpy.ndarray: Coordinates of the interpolated points.
+    """
+    # Keep the segment within the line, also for points at the very end of a line.
+    first = np.searchsorted(line_index, point_line_index, side='left')
+    last = np.searchsorted(line_index, point_line_index, side='right') - 1
+    segment = np.searchsorted(measure, point_measure, side='right') - 1
+    segment = np.clip(segment, first, np.maximum(last - 1, first))
+    next_vertex = np.minimum(segment + 1, last)
+    segment_length = measure[next_vertex] - measure[segment]
+    fraction = np.divide(point_measure - measure[segment], segment_length,
+                         out=np.zeros(len(segment)), where=segment_length > 0)
+    return coords[segment] + fraction[:, None] * (coords[next_vertex] - coords[segment])
+
+
+def split_lines_at_distances(lines, cut_line_index, cut_distances):
+    """
+    Split many LineStrings at distances along them in one pass.
+
+    Parameters:
+    - lines (array-like of shapely.geometry.LineString): Input LineStrings.
+    - cut_line_index (numpy.ndarray): Index of the line to cut, sorted.
+    - cut_distances (numpy.ndarray): Distance from the start of the line to cut at, strictly
+      increasing per line and strictly between 0 and the line length.
+
+    Returns:
+    Tuple (pieces, parent_index) with a NumPy array of LineString pieces, ordered by line
+    and along each line, and the index of the line each piece was cut from.
+    """
+    lines = to_geometry_array(lines)
+    coords, vertex_line, measure, line_start = get_line_measures(lines)
+
+    # Interpolate the cut points on the segments they fall on.
+    cut_measure = line_start[cut_line_index] + cut_distances
+    cut_coords = interpolate_measures(coords, vertex_line, measure, cut_line_index, cut_measure)
+
+    # A cut point ends one piece and starts the next one, pieces are numbered globally.
+    vertex_piece = vertex_line + np.searchsorted(cut_measure, measure, side='left')
+    cut_piece = cut_line_index + np.arange(len(cut_measure))
+    piece = np.concatenate([vertex_piece, cut_piece, cut_piece + 1])
+    position = np.concatenate([measure, cut_measure, cut_measure])
+    points = np.concatenate([coords, cut_coords, cut_coords])
+    order = np.lexsort((position, piece))
+    piece, points = piece[order], points[order]
+
+    # Drop vertices that coincide with a cut point.
+    keep = np.r_[True, (piece[1:] != piece[:-1]) | np.any(points[1:] != points[:-1], axis=1)]
+    pieces = create_linestrings(points[keep], piece[keep])
+    n_pieces = np.bincount(cut_line_index, minlength=len(lines)) + 1
+    parent_index = np.repeat(np.arange(len(lines)), n_pieces)
+    return pieces, parent_index
+
+
 def shorten_linestrings(centerline_df, max_ls_length):
     """
     Shorten LineStrings in a GeoDataFrame to a specified maximum length.
 
+    Lines longer than max_ls_length are cut in pieces of (max_ls_length - 0.01) from their
+    start, all lines are cut at once and the other columns are carried over to the pieces.
+
     Parameters:
-    - centerline_df (geopandas.GeoDataFrame): GeoDataFrame with 'geometry',
-      'length', and 'route_weight' columns.
+    - centerline_df (geopandas.GeoDataFrame): GeoDataFrame with 'centerlines',
+      'length', and 'cl_id' columns.
     - max_ls_length (float): Maximum length for LineStrings.
 
     Returns:
     geopandas.GeoDataFrame: GeoDataFrame with shortened LineStrings.
     """
-    while centerline_df['length'].max() > max_ls_length:
-        id_longest_ls = centerline_df['length'].idxmax()
-        longest_ls = centerline_df.iloc[[id_longest_ls]]['centerlines'].values[0]
-        cut_ls = cut(longest_ls, max_ls_length-0.01)
-        cut_ls_df = gpd.GeoDataFrame(cut_ls, columns=['centerlines']).set_geometry('centerlines')
-        cut_ls_df['length'] = cut_ls_df['centerlines'].length
-        cut_ls_df['cl_id'] = centerline_df['cl_id'][id_longest_ls]
-        centerline_df = centerline_df.drop(index=id_longest_ls)
-        centerline_df = pd.concat([centerline_df, cut_ls_df]).reset_index(drop=True)
+    lines = centerline_df['centerlines'].values
+    lengths = centerline_df['centerlines'].length.values
+    cut_length = max_ls_length - 0.01
+
+    # Number of cuts such that the remaining end piece is not longer than max_ls_length.
+    n_cuts = np.where(lengths > max_ls_length,
+                      np.ceil((lengths - max_ls_length) / cut_length), 0).astype(int)
+    cut_line_index = np.repeat(np.arange(len(lines)), n_cuts)
+    cut_number = np.arange(len(cut_line_index)) - np.repeat(np.cumsum(n_cuts) - n_cuts, n_cuts)
+    pieces, parent_index = split_lines_at_distances(lines, cut_line_index,
+                                                    (cut_number + 1) * cut_length)
+
+    centerline_df = centerline_df.iloc[parent_index].reset_index(drop=True)
+    centerline_df['centerlines'] = gpd.GeoSeries(pieces, crs=centerline_df.crs)
+    centerline_df['length'] = centerline_df['centerlines'].length
     return centerline_df
 
 
@@ -0,0 +1,164 @@
+"""
+Plan accessible routes from the command line or over a local HTTP service.
+
+The final network is loaded once, after which routes can be requested for any user profile.
+Run from the src folder, e.g.:
+
+    python route_service.py serve --port 8000
+    curl 'localhost:8000/route?origin=52.3507,4.7942&destination=52.3520,4.7969
+          &max_curb_height=0.04&min_sidewalk_width=0.8&walk_bike_preference=walk'
+
+    python route_service.py route --origin 52.3507,4.7942 --destination 52.3520,4.7969
+
+Landmarks for faster (ALT) searches can be preprocessed and stored once with:
+
+    python route_service.py preprocess --n_landmarks 8
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'notebooks'))
+
+import pyproj
+
+import route_utils
+import settings as st
+
+if st.my_run == "azure":
+    import config_azure as cf
+elif st.my_run == "local":
+    import config as cf
+
+ROUTE_COLUMNS = ['length', 'path_type', 'crossing', 'obstacle_free_width_float',
+                 'curb_height_max', 'geometry']
+
+# Origin and destination are given in latitude, longitude (CRS_map).
+to_network_crs = pyproj.Transformer.from_crs(st.CRS_map, st.CRS, always_xy=True)
+
+
+def parse_coords(coords):
+    """
+    Parse a 'latitude,longitude' string into network coordinates.
+
+    Parameters:
+    - coords (str): Latitude and longitude separated by a comma.
+
+    Returns:
+    tuple: Coordinates (x, y) in the network CRS.
+    """
+    latitude, longitude = (float(value) for value in coords.split(','))
+    return to_network_crs.transform(longitude, latitude)
+
+
+def get_route_geojson(planner, origin, destination, max_curb_height, min_sidewalk_width,
+                      walk_bike_preference='walk'):
+    """
+    Plan a route and convert it to GeoJSON.
+
+    Parameters:
+    - planner (route_utils.RoutePlanner): Route planner with the network loaded.
+    - origin (str): Origin as 'latitude,longitude'.
+    - destination (str): Destination as 'latitude,longitude'.
+    - max_curb_height (float): Maximum curb height when crossing the street (in meters).
+    - min_sidewalk_width (float): Minimum width of sidewalks (in meters).
+    - walk_bike_preference (str): Preference for sidewalks ('walk') or bike lanes ('bike').
+
+    Returns:
+    dict: GeoJSON FeatureCollection of the route edges, with the total route length.
+    """
+    # Use landmarks only if they were built for the weights of this preference.
+    heuristic = 'alt' if planner.has_landmarks(walk_bike_preference) else 'dijkstra'
+    route = planner.plan_route(parse_coords(origin), parse_coords(destination),
+                               float(max_curb_height), float(min_sidewalk_width),
+                               walk_bike_preference, heuristic=heuristic)
+    geojson = json.loads(route[ROUTE_COLUMNS].to_crs(st.CRS_map).to_json())
+    geojson['route_length'] = round(float(route['length'].sum()), 2)
+    return geojson
+
+
+def make_handler(planner):
+    """
+    Create a request handler that answers GET /route requests with the given planner.
+
+    Parameters:
+    - planner (route_utils.RoutePlanner): Route planner with the network loaded.
+
+    Returns:
+    type: Subclass of BaseHTTPRequestHandler to pass to the HTTP server.
+    """
+    class RouteHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            """Answer a GET /route request with the route as GeoJSON."""
+            url = urlparse(self.path)
+            if url.path != '/route':
+                self.send_error(404)
+                return
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                body = get_route_geojson(planner, **params)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                self.send_error(400, str(e))
+                return
+            content = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/geo+json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    return RouteHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--network', default=cf.output_final_network,
+                        help='final network GeoPackage')
+    parser.add_argument('--landmarks', default=cf.output_final_network_landmarks,
+                        help='landmark distances, used if the file exists')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='run a local HTTP route service')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+
+    route_parser = subparsers.add_parser('route', help='plan a single route')
+    route_parser.add_argument('--origin', required=True, help='latitude,longitude')
+    route_parser.add_argument('--destination', required=True, help='latitude,longitude')
+    route_parser.add_argument('--max_curb_height', type=float, default=0.04)
+    route_parser.add_argument('--min_sidewalk_width', type=float, default=0.8)
+    route_parser.add_argument('--walk_bike_preference', choices=route_utils.WALK_BIKE_PREFERENCES,
+                              default='walk')
+
+    preprocess_parser = subparsers.add_parser('preprocess', help='build and store landmarks')
+    preprocess_parser.add_argument('--n_landmarks', type=int, default=8)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    planner = route_utils.RoutePlanner.from_file(args.network)
+
+    if args.command == 'preprocess':
+        planner.build_landmarks(args.n_landmarks)
+        planner.save_landmarks(args.landmarks)
+        logging.info('Stored landmarks in %s', args.landmarks)
+        return
+    if os.path.exists(args.landmarks):
+        planner.load_landmarks(args.landmarks)
+
+    if args.command == 'serve':
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(planner))
+        logging.info('Serving routes on http://%s:%s/route', args.host, args.port)
+        server.serve_forever()
+    else:
+        json.dump(get_route_geojson(planner, args.origin, args.destination,
+                                    args.max_curb_height, args.min_sidewalk_width,
+                                    args.walk_bike_preference), sys.stdout)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
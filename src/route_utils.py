@@ -0,0 +1,444 @@
+import math
+import sys
+import warnings
+sys.path.append('../notebooks')
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely.ops as so
+
+import graph_utils
+import settings as st
+
+# Columns of the final network that are needed to plan routes.
+NETWORK_COLUMNS = ['length', 'obstacle_free_width_float', 'width_fill', 'sidewalk_id', 'crossing',
+                   'walk_bike_connection', 'walk_public_transport_stop_connection',
+                   'public_transport_stop', 'bikepath_id', 'path_type',
+                   'crossing_type', 'curb_height_max', 'stop_type', 'stop_name',
+                   'stop_placement_type', 'wheelchair_accessible', 'geometry']
+
+WALK_BIKE_PREFERENCES = ['walk', 'bike']
+
+# Path types stored as small integer codes per edge.
+PATH_TYPE_CODES = {'walk': 0, 'bike': 1, 'walk_bike_connection': 2}
+
+# Edge weights that routes can be planned with.
+WEIGHT_PROFILES = ['length'] + [f'my_weight_{preference}' for preference in WALK_BIKE_PREFERENCES]
+
+# Edge attributes kept as typed arrays in the routing graph.
+EDGE_COLUMNS = {'length': np.float64, 'curb_height_max': np.float64,
+                'obstacle_free_width_float': np.float64}
+
+
+def prepare_network(df_raw):
+    """
+    Prepare the final network for route planning, independent of any user profile.
+
+    Parameters:
+    - df_raw (GeoDataFrame): Network with widths, crossings and public transport stops.
+
+    Returns:
+    GeoDataFrame: Network edges with filled widths and directionality.
+    """
+    df = df_raw[NETWORK_COLUMNS].copy()
+    df = df.rename(columns={'walk_public_transport_stop_connection': 'walk_pt_connection'})
+
+    # Public transport stops are points, only their connections are part of the graph.
+    df = df[df.geometry.geom_type == 'LineString'].reset_index(drop=True)
+
+    # Give crossings, bike paths and walk bike connections a width.
+    df.loc[df['crossing'] == 'Yes', 'obstacle_free_width_float'] = st.width_6
+    df.loc[df['crossing'] == 'Yes', 'width_fill'] = 4
+    df.loc[~df['bikepath_id'].isnull(), 'obstacle_free_width_float'] = st.width_5
+    df.loc[~df['bikepath_id'].isnull(), 'width_fill'] = 4
+    df.loc[df['walk_bike_connection'] == 'Yes', 'obstacle_free_width_float'] = st.width_5
+    df.loc[df['walk_bike_connection'] == 'Yes', 'width_fill'] = 4
+
+    # Give walk public transport stop connections a width if unknown.
+    pt_mask = (df['walk_pt_connection'] == 'Yes') & df['obstacle_free_width_float'].isnull()
+    df.loc[pt_mask, 'width_fill'] = 4
+    df.loc[pt_mask, 'obstacle_free_width_float'] = st.width_2
+
+    # Sidewalks are bi-directional, bike paths are not.
+    df['oneway'] = ~df['bikepath_id'].isna()
+    return df
+
+
+def get_weight(length, crossing, path_type, walk_bike_preference):
+    """
+    Get the routing weight (combination of objectives) of each edge for a preference.
+
+    Parameters:
+    - length (numpy.ndarray): Length per edge id.
+    - crossing (numpy.ndarray): Boolean mask of crossings per edge id.
+    - path_type (numpy.ndarray): Path type code (see PATH_TYPE_CODES) per edge id.
+    - walk_bike_preference (str): Preference for using sidewalks ('walk') or bike lanes ('bike').
+
+    Returns:
+    numpy.ndarray: Weight per edge id.
+    """
+    my_weight = np.array(length, dtype=float)
+    my_weight[crossing] *= st.crossing_weight_factor
+    my_weight[path_type == PATH_TYPE_CODES[walk_bike_preference]] *= \
+        st.walk_bike_preference_weight_factor
+    return my_weight
+
+
+class RoutePlanner:
+    """
+    Plan accessible routes on a network that is loaded and turned into a graph only once.
+
+    The network is stored as a CSR graph with integer node ids, and lengths, curb heights,
+    widths, crossings and path types are kept as typed arrays indexed by edge id. The
+    weights of the preferences are derived from these arrays. User profiles (max curb height,
+    min sidewalk width and walk/bike preference) are applied while searching, so a new
+    profile costs nothing to set up and no graph has to be rebuilt per route request.
+    """
+
+    def __init__(self, df_raw):
+        self.df = prepare_network(df_raw)
+        self.public_transport_stops = df_raw[df_raw['public_transport_stop'] == 'Yes']
+        self.graph = graph_utils.CSRGraph.from_gdf(self.df, EDGE_COLUMNS, oneway_column='oneway')
+        self.graph.edge_data['crossing'] = (self.df['crossing'] == 'Yes').to_numpy()
+        self.graph.edge_data['path_type'] = (self.df['path_type'].map(PATH_TYPE_CODES)
+                                             .fillna(-1).to_numpy(np.int8))
+        self.weights = {'length': self.graph.edge_data['length']}
+        for walk_bike_preference in WALK_BIKE_PREFERENCES:
+            self.weights[f'my_weight_{walk_bike_preference}'] = get_weight(
+                self.graph.edge_data['length'], self.graph.edge_data['crossing'],
+                self.graph.edge_data['path_type'], walk_bike_preference)
+        self.snap_index = graph_utils.SnapIndex(self.graph, self.df.geometry.values)
+        self.landmarks = {}
+
+    @classmethod
+    def from_file(cls, network_file):
+        """
+        Create a route planner from a stored final network.
+
+        Parameters:
+        - network_file (str): Path to the final network GeoPackage.
+
+        Returns:
+        RoutePlanner: Route planner with the network loaded.
+        """
+        return cls(gpd.read_file(network_file).to_crs(st.CRS))
+
+    def get_weight_profile(self, walk_bike_preference='walk', weight='my_weight'):
+        """
+        Get the name of the weight profile for a preference and objective.
+
+        Parameters:
+        - walk_bike_preference (str): Preference for sidewalks ('walk') or bike lanes ('bike').
+        - weight (str): Objective to minimize, 'my_weight' or 'length'.
+
+        Returns:
+        str: Weight profile, one of WEIGHT_PROFILES.
+        """
+        if walk_bike_preference not in WALK_BIKE_PREFERENCES:
+            raise ValueError(f'Unknown walk_bike_preference: {walk_bike_preference}')
+        if weight == 'my_weight':
+            return f'my_weight_{walk_bike_preference}'
+        elif weight == 'length':
+            return 'length'
+        raise ValueError(f'Unknown weight: {weight}')
+
+    def get_weight_array(self, walk_bike_preference='walk', weight='my_weight'):
+        """
+        Get the weight per edge id for a preference and objective.
+
+        Parameters:
+        - walk_bike_preference (str): Preference for sidewalks ('walk') or bike lanes ('bike').
+        - weight (str): Objective to minimize, 'my_weight' or 'length'.
+
+        Returns:
+        numpy.ndarray: Weight per edge id.
+        """
+        return self.weights[self.get_weight_profile(walk_bike_preference, weight)]
+
+    def has_landmarks(self, walk_bike_preference='walk', weight='my_weight'):
+        """
+        Check whether ALT searches are possible for a preference and objective.
+
+        Parameters:
+        - walk_bike_preference (str): Preference for sidewalks ('walk') or bike lanes ('bike').
+        - weight (str): Objective to minimize, 'my_weight' or 'length'.
+
+        Returns:
+        bool: True if landmarks were built or loaded for the weight profile.
+        """
+        return self.get_weight_profile(walk_bike_preference, weight) in self.landmarks
+
+    def build_landmarks(self, n_landmarks=8):
+        """
+        Preprocess landmark distances for ALT searches for all weight profiles.
+
+        Parameters:
+        - n_landmarks (int): Number of landmarks per weight profile.
+        """
+        for profile in WEIGHT_PROFILES:
+            self.landmarks[profile] = graph_utils.Landmarks.build(
+                self.graph, self.weights[profile], n_landmarks=n_landmarks)
+
+    def save_landmarks(self, landmarks_file):
+        """
+        Save the landmark distances of all weight profiles to a .npz file.
+
+        Checksums of the graph and of the weights of each profile are stored as well, so
+        landmarks are only loaded for the network and weights they were built for.
+
+        Parameters:
+        - landmarks_file (str): Path to the .npz file.
+        """
+        arrays = {}
+        for profile, landmarks in self.landmarks.items():
+            arrays.update(landmarks.to_dict(prefix=f'{profile}_'))
+            arrays[f'{profile}_checksum'] = graph_utils.get_checksum([self.weights[profile]])
+        np.savez(landmarks_file, n_nodes=self.graph.n_nodes, checksum=self.graph.checksum,
+                 **arrays)
+
+    def load_landmarks(self, landmarks_file):
+        """
+        Load landmark distances stored with save_landmarks for the same network.
+
+        Landmarks of a weight profile whose weights changed since they were stored are
+        skipped with a warning.
+
+        Parameters:
+        - landmarks_file (str): Path to the .npz file.
+        """
+        with np.load(landmarks_file) as data:
+            if ('checksum' not in data or int(data['n_nodes']) != self.graph.n_nodes
+                    or str(data['checksum']) != self.graph.checksum):
+                raise ValueError(f'{landmarks_file} does not belong to this network')
+            for profile in WEIGHT_PROFILES:
+                if f'{profile}_landmarks' not in data:
+                    continue
+                checksum = graph_utils.get_checksum([self.weights[profile]])
+                if (f'{profile}_checksum' not in data
+                        or str(data[f'{profile}_checksum']) != checksum):
+                    warnings.warn(f'Skipping the {profile} landmarks in {landmarks_file}, '
+                                  f'they were built for other weights')
+                    continue
+                self.landmarks[profile] = graph_utils.Landmarks.load(
+                    data, prefix=f'{profile}_')
+
+    def _get_snap_costs(self, point, weight_array, max_curb_height, min_sidewalk_width,
+                        snap_to_edge, max_dist):
+        """
+        Snap a point to the network and get the costs between the point and its nodes.
+
+        Returns:
+        Tuple (departures, arrivals, snap) with the cost from the point to each node, the
+        cost from each node to the point and the snapped (edge id, position) if the point
+        was snapped onto an edge. Returns (None, None, None) if the point cannot be snapped.
+        """
+        if not snap_to_edge:
+            nodes, _ = self.snap_index.nearest_nodes([point], max_dist, max_curb_height,
+                                                     min_sidewalk_width)
+            if nodes[0] < 0:
+                return None, None, None
+            return {int(nodes[0]): 0.0}, {int(nodes[0]): 0.0}, None
+
+        edges, _, positions, _ = self.snap_index.nearest_edges([point], max_dist,
+                                                               max_curb_height,
+                                                               min_sidewalk_width)
+        edge, position = int(edges[0]), positions[0]
+        if edge < 0:
+            return None, None, None
+        u, v = (int(node) for node in self.graph.edge_nodes[edge])
+        line_length = self.df.geometry.iloc[edge].length
+        fraction = position / line_length if line_length > 0 else 0
+        edge_weight = weight_array[edge]
+        departures, arrivals = {v: (1 - fraction) * edge_weight}, {u: fraction * edge_weight}
+        if not self.df['oneway'].iloc[edge]:
+            departures[u] = min(departures.get(u, np.inf), fraction * edge_weight)
+            arrivals[v] = min(arrivals.get(v, np.inf), (1 - fraction) * edge_weight)
+        return departures, arrivals, (edge, position)
+
+    def _get_partial_edge(self, edge, start, end, weight_array):
+        """
+        Get the part of an edge between two positions along its geometry as a route row.
+
+        Parameters:
+        - edge (int): Edge id.
+        - start (float): Start position along the edge geometry.
+        - end (float): End position along the edge geometry.
+        - weight_array (numpy.ndarray): Weight per edge id.
+
+        Returns:
+        GeoDataFrame: One row with the partial geometry, length and 'my_weight'.
+        """
+        line = self.df.geometry.iloc[edge]
+        fraction = abs(end - start) / line.length if line.length > 0 else 0
+        row = self.df.iloc[[edge]].assign(my_weight=weight_array[edge] * fraction)
+        row['length'] = row['length'] * fraction
+        row.geometry = [so.substring(line, start, end)]
+        return row
+
+    def plan_route(self, origin, destination, max_curb_height, min_sidewalk_width,
+                   walk_bike_preference='walk', weight='my_weight', heuristic='dijkstra',
+                   snap_to_edge=False, max_dist=st.max_dist):
+        """
+        Plan a route between an origin and destination for a user profile.
+
+        Parameters:
+        - origin (tuple): Origin coordinates (x, y) in the network CRS.
+        - destination (tuple): Destination coordinates (x, y) in the network CRS.
+        - max_curb_height (float): Maximum curb height when crossing the street (in meters).
+        - min_sidewalk_width (float): Minimum width of sidewalks (in meters).
+        - walk_bike_preference (str): Preference for sidewalks ('walk') or bike lanes ('bike').
+        - weight (str): Objective to minimize, 'my_weight' or 'length'.
+        - heuristic (str): Search algorithm, 'dijkstra', 'a_star' or 'alt' (A* with
+          landmarks, see build_landmarks).
+        - snap_to_edge (bool): Snap origin and destination onto the nearest accessible edge
+          and split it there, instead of snapping to the nearest accessible node.
+        - max_dist (float): Maximum distance between origin/destination and the network.
+
+        Returns:
+        GeoDataFrame: Edges of the route in order with their 'my_weight', empty if there is
+        no accessible route.
+        """
+        profile = self.get_weight_profile(walk_bike_preference, weight)
+        weight_array = self.weights[profile]
+        heuristic_factor, landmarks = self._get_search_options(profile, weight, heuristic)
+
+        no_route = self.df.iloc[[]].assign(my_weight=[])
+        sources, _, origin_snap = self._get_snap_costs(
+            origin, weight_array, max_curb_height, min_sidewalk_width, snap_to_edge, max_dist)
+        _, targets, dest_snap = self._get_snap_costs(
+            destination, weight_array, max_curb_height, min_sidewalk_width, snap_to_edge,
+            max_dist)
+        if sources is None or targets is None:
+            return no_route
+
+        dist, pred, dest_node = graph_utils.search(
+            self.graph, sources, weight_array, targets=targets, target_point=destination,
+            max_curb_height=max_curb_height, min_sidewalk_width=min_sidewalk_width,
+            heuristic_factor=heuristic_factor, landmarks=landmarks)
+
+        network_cost = math.inf if dest_node is None else dist[dest_node] + targets[dest_node]
+        direct_route = self._get_direct_route(origin_snap, dest_snap, weight_array,
+                                              network_cost)
+        if direct_route is not None:
+            return direct_route
+        if dest_node is None:
+            return no_route
+        origin_node, edge_ids = graph_utils.get_path(pred, dest_node)
+        return self._get_route_edges(edge_ids, origin_node, dest_node, origin_snap, dest_snap,
+                                     weight_array)
+
+    def _get_search_options(self, profile, weight, heuristic):
+        """
+        Get the A* heuristic factor and landmarks for a search algorithm.
+
+        Parameters:
+        - profile (str): Weight profile.
+        - weight (str): Objective to minimize, 'my_weight' or 'length'.
+        - heuristic (str): Search algorithm, 'dijkstra', 'a_star' or 'alt'.
+
+        Returns:
+        Tuple (heuristic_factor, landmarks) to pass to graph_utils.search.
+        """
+        if heuristic == 'dijkstra':
+            return 0, None
+        elif heuristic == 'a_star':
+            # Scale the euclidean distance so it never overestimates the weight.
+            return (min(1, st.walk_bike_preference_weight_factor)
+                    if weight == 'my_weight' else 1), None
+        elif heuristic == 'alt':
+            if profile not in self.landmarks:
+                raise ValueError(f'No landmarks for {profile}, see build_landmarks')
+            return 0, self.landmarks[profile]
+        raise ValueError(f'Unknown heuristic: {heuristic}')
+
+    def _get_direct_route(self, origin_snap, dest_snap, weight_array, network_cost):
+        """
+        Get the route along a single edge if origin and destination were snapped onto it.
+
+        Parameters:
+        - origin_snap (tuple): Snapped (edge id, position) of the origin, or None.
+        - dest_snap (tuple): Snapped (edge id, position) of the destination, or None.
+        - weight_array (numpy.ndarray): Weight per edge id.
+        - network_cost (float): Cost of the route via the network nodes.
+
+        Returns:
+        GeoDataFrame: The partial edge, or None if it is no shorter than the network route.
+        """
+        if origin_snap is None or origin_snap[0] != dest_snap[0]:
+            return None
+        edge, start = origin_snap
+        end = dest_snap[1]
+        if end < start and self.df['oneway'].iloc[edge]:
+            return None
+        line_length = self.df.geometry.iloc[edge].length
+        direct_cost = weight_array[edge] * abs(end - start) / line_length
+        if direct_cost > network_cost:
+            return None
+        return self._get_partial_edge(edge, start, end, weight_array)
+
+    def _get_route_edges(self, edge_ids, origin_node, dest_node, origin_snap, dest_snap,
+                         weight_array):
+        """
+        Get the edges of a route, with the partial edges to and from snapped points.
+
+        Parameters:
+        - edge_ids (list): Edge ids of the path from origin_node to dest_node.
+        - origin_node (int): First node of the path.
+        - dest_node (int): Last node of the path.
+        - origin_snap (tuple): Snapped (edge id, position) of the origin, or None.
+        - dest_snap (tuple): Snapped (edge id, position) of the destination, or None.
+        - weight_array (numpy.ndarray): Weight per edge id.
+
+        Returns:
+        GeoDataFrame: Edges of the route in order with their 'my_weight'.
+        """
+        route = [self.df.iloc[edge_ids].assign(my_weight=weight_array[edge_ids])]
+        if origin_snap is not None:
+            edge, position = origin_snap
+            u, v = self.graph.edge_nodes[edge]
+            end = self.df.geometry.iloc[edge].length if origin_node == v else 0
+            route.insert(0, self._get_partial_edge(edge, position, end, weight_array))
+        if dest_snap is not None:
+            edge, position = dest_snap
+            u, v = self.graph.edge_nodes[edge]
+            start = 0 if dest_node == u else self.df.geometry.iloc[edge].length
+            route.append(self._get_partial_edge(edge, start, position, weight_array))
+        return pd.concat(route)
+
+    def route_matrix(self, origins, destinations, max_curb_height, min_sidewalk_width,
+                     walk_bike_preference='walk', weight='my_weight', return_paths=False,
+                     n_workers=None, max_dist=st.max_dist):
+        """
+        Get the route costs between many origins and destinations for a user profile.
+
+        Parameters:
+        - origins (numpy.ndarray or GeoSeries): Origin coordinates of shape (n, 2) in the
+          network CRS, or points such as `planner.public_transport_stops.geometry`.
+        - destinations (numpy.ndarray or GeoSeries): Destination coordinates or points.
+        - max_curb_height (float): Maximum curb height when crossing the street (in meters).
+        - min_sidewalk_width (float): Minimum width of sidewalks (in meters).
+        - walk_bike_preference (str): Preference for sidewalks ('walk') or bike lanes ('bike').
+        - weight (str): Objective to minimize, 'my_weight' or 'length'.
+        - return_paths (bool): Whether to return the routes as well.
+        - n_workers (int): Number of worker processes, None for the number of CPUs.
+        - max_dist (float): Maximum distance between origins/destinations and the network.
+
+        Returns:
+        Tuple (costs, paths) with a NumPy cost matrix of shape (n_origins, n_destinations)
+        (inf if there is no accessible route) and a nested list of routes as row positions
+        in `planner.df` (None if there is no route), or None if return_paths is False.
+        """
+        weight_array = self.get_weight_array(walk_bike_preference, weight)
+        if isinstance(origins, gpd.GeoSeries):
+            origins = origins.get_coordinates().values
+        if isinstance(destinations, gpd.GeoSeries):
+            destinations = destinations.get_coordinates().values
+        origin_nodes, _ = self.snap_index.nearest_nodes(origins, max_dist, max_curb_height,
+                                                        min_sidewalk_width)
+        dest_nodes, _ = self.snap_index.nearest_nodes(destinations, max_dist, max_curb_height,
+                                                      min_sidewalk_width)
+        return graph_utils.many_to_many(self.graph, origin_nodes, dest_nodes, weight_array,
+                                        max_curb_height=max_curb_height,
+                                        min_sidewalk_width=min_sidewalk_width,
+                                        return_paths=return_paths, n_workers=n_workers)
@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+import shapely
+import shapely.geometry as sg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'notebooks'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import bgt_utils
+
+FEATURES = [
+    {'type': 'Feature', 'id': 'wegdelen-geometrie.1', 'properties': {'bgt_functie': 'voetpad'},
+     'geometry': {'type': 'Polygon',
+                  'coordinates': [[[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]]}},
+    {'type': 'Feature', 'id': 'wegdelen-geometrie.2', 'properties': {'bgt_functie': 'fietspad'},
+     'geometry': {'type': 'Polygon',
+                  'coordinates': [[[20, 0], [30, 0], [30, 10], [20, 0]]]}},
+    {'type': 'Feature', 'id': 'wegdelen-geometrie.3', 'properties': {'bgt_functie': 'voetpad'},
+     'geometry': {'type': 'Polygon',
+                  'coordinates': [[[20, 0], [30, 0], [30, 10], [20, 0]]]}},
+]
+BBOX = ((0, 0), (100, 100))
+
+
+class StandInWFS(BaseHTTPRequestHandler):
+    """Answers every GetFeature request with the same features, paged by STARTINDEX/COUNT."""
+
+    paths = []
+    max_count = None
+    status = 200
+
+    def do_GET(self):  # noqa: N802
+        """Count the request and send a page of the features."""
+        self.paths.append(self.path)
+        query = parse_qs(urlparse(self.path).query)
+        params = {key: int(query[key][0]) for key in ('STARTINDEX', 'COUNT') if key in query}
+        start = params.get('STARTINDEX', 0)
+        count = min(params.get('COUNT', len(FEATURES)), self.max_count or len(FEATURES))
+        body = {'type': 'FeatureCollection', 'features': FEATURES[start:start + count],
+                'numberMatched': len(FEATURES)}
+        content = json.dumps(body).encode()
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def wfs(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInWFS)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StandInWFS.paths = []
+    StandInWFS.max_count = None
+    StandInWFS.status = 200
+    monkeypatch.setattr(bgt_utils, 'WFS_URL', f'http://127.0.0.1:{server.server_port}/?')
+    yield StandInWFS.paths
+    server.shutdown()
+    server.server_close()
+
+
+def request(bbox=BBOX, **cache_kwargs):
+    cache_kwargs = {'max_age': None, 'max_size': None, 'offline': False, **cache_kwargs}
+    return bgt_utils.scrape_amsterdam_bgt(bbox, **cache_kwargs)
+
+
+def test_cache_hit(wfs, tmp_path):
+    first = request(cache_folder=str(tmp_path))
+    second = request(cache_folder=str(tmp_path))
+    assert first == second
+    assert len(first['features']) == len(FEATURES)
+    assert len(wfs) == 1
+
+
+def test_cache_expiry(wfs, tmp_path):
+    request(cache_folder=str(tmp_path))
+    request(cache_folder=str(tmp_path), max_age=0)
+    assert len(wfs) == 2
+
+
+def test_offline(wfs, tmp_path):
+    cached = request(cache_folder=str(tmp_path))
+    # Offline mode uses cached responses regardless of their age.
+    assert request(cache_folder=str(tmp_path), max_age=0, offline=True) == cached
+    with pytest.raises(ValueError):
+        request(((1, 1), (2, 2)), cache_folder=str(tmp_path), offline=True)
+    assert len(wfs) == 1
+
+
+def test_eviction(wfs, tmp_path):
+    request(cache_folder=str(tmp_path))
+    file_size = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    for i in range(5):
+        request(((i, 0), (1, 1)), cache_folder=str(tmp_path), max_size=3 * file_size)
+    assert len(os.listdir(tmp_path)) == 3
+    # The least recently used responses were evicted, the last ones are still cached.
+    request(((4, 0), (1, 1)), cache_folder=str(tmp_path))
+    assert len(wfs) == 6
+
+
+def test_concurrent_eviction(wfs, tmp_path):
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(
+            lambda i: request(((i % 10, 0), (1, 1)), cache_folder=str(tmp_path), max_size=1),
+            range(40)))
+    assert all(len(result['features']) == len(FEATURES) for result in results)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_error_status(wfs, tmp_path):
+    StandInWFS.status = 500
+    with pytest.raises(requests.HTTPError):
+        request(cache_folder=str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_tiled(wfs, tmp_path):
+    # The WFS returns fewer features than requested, paging follows numberMatched.
+    StandInWFS.max_count = 1
+    gdf = bgt_utils.get_bgt_data_tiled(BBOX, ['voetpad', 'fietspad'], tile_size=50,
+                                       n_workers=2, page_size=2, cache_folder=str(tmp_path),
+                                       max_age=None, max_size=None, offline=False)
+    # Every tile returns all features, which are kept once, also with equal geometries.
+    assert len(wfs) == 4 * len(FEATURES)
+    assert len(gdf) == len(FEATURES)
+    assert list(gdf.columns) == ['naam', 'geometry']
+
+
+def test_geojson_to_polygons():
+    square = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+    hole = [[2, 2], [4, 2], [4, 4], [2, 2]]
+    triangle = [[20, 0], [30, 0], [30, 10], [20, 0]]
+    geometries = [
+        {'type': 'Polygon', 'coordinates': [square, hole]},
+        {'type': 'MultiPolygon', 'coordinates': [[triangle], [square, hole]]},
+        {'type': 'Polygon', 'coordinates': [triangle]},
+    ]
+    expected = [sg.shape(geometry) for geometry in geometries]
+    polygons = bgt_utils.geojson_to_polygons(geometries)
+    assert all(polygon.equals_exact(other, 0) for polygon, other in zip(polygons, expected))
+    assert len(bgt_utils.geojson_to_polygons([])) == 0
+
+    features = [{'type': 'Feature', 'properties': {'bgt_functie': layer}, 'geometry': geometry}
+                for layer, geometry in zip(['voetpad', 'fietspad', 'voetpad'], geometries)]
+    gdf = bgt_utils.features_to_gdf(features, ['voetpad'])
+    assert list(gdf['naam']) == ['voetpad', 'voetpad']
+    assert all(polygon.equals_exact(other, 0)
+               for polygon, other in zip(gdf.geometry, [expected[0], expected[2]]))
+
+
+@pytest.mark.skipif(not hasattr(shapely, 'polygons'), reason='requires shapely 2')
+def test_geojson_to_polygons_drops_z():
+    square = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+    geometry = {'type': 'Polygon', 'coordinates': [[[x, y, 1.5] for x, y in square]]}
+    polygon = bgt_utils.geojson_to_polygons([geometry])[0]
+    assert polygon.equals_exact(sg.Polygon(square), 0)
+    assert not polygon.has_z